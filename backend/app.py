@@ -1,5 +1,5 @@
 import gradio as gr
-from app.chatbot import answer_user_query
+from app.chatbot import astream_answer
 
 # ---------- CSS: Clean & Professional ---------- #
 css_code = """
@@ -43,10 +43,12 @@ textarea {
 
 # ---------- Chat Logic ---------- #
 async def respond(message, history):
-    response = await answer_user_query(message)  # ✅ Fixed: no await
+    # Stream tokens into the last assistant message as they arrive
     history.append({"role": "user", "content": message})
-    history.append({"role": "assistant", "content": response})
-    return "", history
+    history.append({"role": "assistant", "content": ""})
+    async for token in astream_answer(message):
+        history[-1]["content"] += token
+        yield "", history
 
 # ---------- Interface ---------- #
 with gr.Blocks(css=css_code, title="Changi Airport Assistant") as demo:
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from app.chatbot import answer_user_query
-import asyncio
+from app.chatbot import aanswer_user_query, astream_answer, get_answer_cache, inflight
+from app.embeddings import get_query_embedding_cache, query_batch_stats
+import json
 import logging
 
 router = APIRouter()
@@ -28,8 +30,7 @@ async def ask_question(request: QueryRequest) -> QueryResponse:
     Endpoint to answer user queries using the RAG pipeline.
     """
     try:
-        # Call directly (no asyncio.to_thread)
-        answer = answer_user_query(request.query)
+        answer = await aanswer_user_query(request.query)
 
         return QueryResponse(answer=answer)
 
@@ -43,3 +44,35 @@ async def ask_question(request: QueryRequest) -> QueryResponse:
             detail="Internal server error. Please try again later."
         )
 
+
+
+@router.post("/ask/stream")
+async def ask_question_stream(request: QueryRequest) -> StreamingResponse:
+    """
+    Server-Sent Events variant of /ask: emits answer tokens as they are generated.
+    Each event carries {"token": ...}; the stream ends with a "done" event.
+    """
+    async def event_stream():
+        async for token in astream_answer(request.query):
+            yield f"data: {json.dumps({'token': token})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/stats")
+async def stats() -> dict:
+    """
+    Runtime counters of this worker: caches, request coalescing and
+    achieved query-embedding batch sizes.
+    """
+    return {
+        "query_embedding_cache": get_query_embedding_cache().stats(),
+        "query_embedding_batches": query_batch_stats(),
+        "answer_cache": get_answer_cache().stats(),
+        "single_flight": inflight.stats(),
+    }
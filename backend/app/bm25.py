@@ -0,0 +1,177 @@
+import os
+import re
+import json
+import math
+import heapq
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it of on or that the this to was what "
+    "when where which who will with you your can do does".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase alphanumeric tokens; keeps short codes such as "t4" or "b12".
+    """
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in _STOPWORDS]
+
+
+class BM25Index:
+    """
+    Compact in-memory inverted index with Okapi BM25 scoring.
+
+    Documents are keyed by chunk id and can be added or removed
+    incrementally. Postings map each term to {doc id: term frequency};
+    a query only touches the postings of its own terms.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.texts: Dict[str, str] = {}
+        self.lengths: Dict[str, int] = {}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.texts
+
+    def add(self, doc_id: str, text: str) -> None:
+        if doc_id in self.texts:
+            return  # ids are content hashes: same id, same text
+        counts = Counter(tokenize(text))
+        self.texts[doc_id] = text
+        self.lengths[doc_id] = sum(counts.values())
+        self._total_length += self.lengths[doc_id]
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+
+    def remove(self, doc_id: str) -> None:
+        text = self.texts.pop(doc_id, None)
+        if text is None:
+            return
+        self._total_length -= self.lengths.pop(doc_id)
+        for term in set(tokenize(text)):
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[str, float]]:
+        """
+        Return the top_k (doc id, BM25 score) pairs for the query.
+        """
+        n = len(self.texts)
+        if n == 0:
+            return []
+        avgdl = self._total_length / n or 1.0
+
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, tf in docs.items():
+                norm = tf + self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / avgdl)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+    # ---------- Persistence ---------- #
+
+    def save(self, path: str, index_key: str) -> None:
+        """
+        Persist documents and postings; postings are stored as parallel
+        lists of document positions and term frequencies.
+        """
+        ids = list(self.texts)
+        position = {doc_id: i for i, doc_id in enumerate(ids)}
+        state = {
+            "index": index_key,
+            "k1": self.k1,
+            "b": self.b,
+            "ids": ids,
+            "texts": [self.texts[doc_id] for doc_id in ids],
+            "lengths": [self.lengths[doc_id] for doc_id in ids],
+            "postings": {
+                term: [[position[doc_id] for doc_id in docs], list(docs.values())]
+                for term, docs in self.postings.items()
+            },
+        }
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, index_key: str) -> Optional["BM25Index"]:
+        """
+        Load a persisted index; None if missing or built for another index.
+        """
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("index") != index_key:
+            return None
+
+        bm25 = cls(k1=state["k1"], b=state["b"])
+        ids = state["ids"]
+        bm25.texts = dict(zip(ids, state["texts"]))
+        bm25.lengths = dict(zip(ids, state["lengths"]))
+        bm25._total_length = sum(state["lengths"])
+        bm25.postings = {
+            term: {ids[i]: tf for i, tf in zip(positions, tfs)}
+            for term, (positions, tfs) in state["postings"].items()
+        }
+        return bm25
+
+
+class BM25Store:
+    """
+    Read side for the API: loads the persisted index lazily and reloads it
+    when an ingest run rewrites the file.
+    """
+
+    def __init__(self, path: str, index_key: str):
+        self.path = path
+        self.index_key = index_key
+        self._index: Optional[BM25Index] = None
+        self._mtime: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[BM25Index]:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self._index = BM25Index.load(self.path, self.index_key)
+                    self._mtime = mtime
+        return self._index
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Fuse ranked id lists: score(id) = sum over lists of 1 / (k + rank).
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
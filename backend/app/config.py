@@ -1,4 +1,5 @@
 import os
+import threading
 from dotenv import load_dotenv
 from typing import Optional
 
@@ -7,7 +8,7 @@ class ConfigError(Exception):
     pass
 
 class Config:
-    def __init__(self):
+    def __init__(self, require_llm: bool = True, require_embeddings: bool = True):
         load_dotenv()
 
         self.GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
@@ -16,23 +17,125 @@ class Config:
         self.PINECONE_INDEX = os.getenv("PINECONE_INDEX")
         self.GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
-        self.validate()
+        # Provider endpoint overrides (regional endpoints, proxies, the offline load test)
+        self.PINECONE_HOST = os.getenv("PINECONE_HOST")  # skips the describe_index lookup
+        self.GROQ_API_BASE = os.getenv("GROQ_API_BASE")
+        self.GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+        self.GEMINI_TRANSPORT = os.getenv("GEMINI_TRANSPORT")  # "grpc" (library default) or "rest"
+
+        # LLM HTTP connection pool (keep-alive), sized to the expected concurrency
+        self.LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+        self.LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+
+        # Send one embedding / retrieval / LLM request at startup to open connections early
+        self.WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").strip().lower() in ("1", "true", "yes")
+        self.WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "10"))
+
+        # Vector store backend: "pinecone" (hosted) or "local" (in-process, memory-mapped)
+        self.VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone").strip().lower()
+        self.LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", os.path.join("data", "local_index"))
+
+        # Document embedding scheduler: batch size, global concurrency and quota (0 = unlimited)
+        self.EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+        self.EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+        self.EMBED_REQUESTS_PER_MINUTE = float(os.getenv("EMBED_REQUESTS_PER_MINUTE", "1500"))
+
+        # Persistent document embedding cache (SQLite); empty disables it
+        self.EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", os.path.join("data", "embedding_cache.sqlite3"))
+
+        # Query embedding cache (LRU + TTL)
+        self.EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "1024"))
+        self.EMBED_CACHE_TTL = float(os.getenv("EMBED_CACHE_TTL", "3600"))
+
+        # Micro-batching of concurrent query embeddings: max queries per call and max wait (<= 1 disables)
+        self.QUERY_BATCH_SIZE = int(os.getenv("QUERY_BATCH_SIZE", "32"))
+        self.QUERY_BATCH_WAIT_MS = float(os.getenv("QUERY_BATCH_WAIT_MS", "5"))
+
+        # Semantic answer cache; invalidated whenever the index version stamp changes.
+        # The stamp is the mtime of a local file: only workers sharing that filesystem
+        # with the ingest job see it change, others rely on ANSWER_CACHE_TTL (seconds)
+        self.ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+        self.ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+        self.ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+        self.INDEX_VERSION_PATH = os.getenv("INDEX_VERSION_PATH", os.path.join("data", "index_version"))
+
+        # Per-URL content hashes and chunk ids of the last ingest run
+        self.INGEST_MANIFEST_PATH = os.getenv("INGEST_MANIFEST_PATH", os.path.join("data", "ingest_manifest.json"))
+
+        # Local set of chunk ids known to be in the index (replaces per-batch fetch dedup)
+        self.KNOWN_IDS_PATH = os.getenv("KNOWN_IDS_PATH", os.path.join("data", "known_ids.npz"))
+
+        # Keyword (BM25) index fused with dense results via reciprocal rank fusion; empty disables it
+        self.BM25_INDEX_PATH = os.getenv("BM25_INDEX_PATH", os.path.join("data", "bm25_index.json"))
+        self.HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+        self.RRF_K = int(os.getenv("RRF_K", "60"))
+        self.RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "3"))
 
-    def validate(self):
+        # Context selection: over-fetched candidates, MMR relevance/diversity trade-off, prompt token budget
+        self.CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", "12"))
+        self.MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.5"))
+        self.CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+
+        # Near-duplicate chunk removal at ingest (MinHash-LSH estimated Jaccard similarity; <= 0 disables)
+        self.NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.9"))
+
+        # Process pool for CPU-bound cleaning & chunking (<= 1 runs in-process)
+        self.INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+        self.INGEST_TASK_PAGES = int(os.getenv("INGEST_TASK_PAGES", "8"))
+
+        self.validate(require_llm=require_llm, require_embeddings=require_embeddings)
+
+    def validate(self, require_llm: bool = True, require_embeddings: bool = True):
         missing = []
-        if not self.GEMINI_API_KEY:
+        if self.VECTOR_BACKEND not in ("pinecone", "local"):
+            raise ConfigError(f"Unsupported VECTOR_BACKEND: {self.VECTOR_BACKEND!r} (expected 'pinecone' or 'local')")
+
+        if require_embeddings and not self.GEMINI_API_KEY:
             missing.append("GEMINI_API_KEY")
-        if not self.PINECONE_API_KEY:
-            missing.append("PINECONE_API_KEY")
-        if not self.PINECONE_ENV:
-            missing.append("PINECONE_ENVIRONMENT")
-        if not self.PINECONE_INDEX:
-            missing.append("PINECONE_INDEX")
-        if not self.GROQ_API_KEY:
+        if self.VECTOR_BACKEND == "pinecone":
+            if not self.PINECONE_API_KEY:
+                missing.append("PINECONE_API_KEY")
+            if not self.PINECONE_ENV:
+                missing.append("PINECONE_ENVIRONMENT")
+            if not self.PINECONE_INDEX:
+                missing.append("PINECONE_INDEX")
+        if require_llm and not self.GROQ_API_KEY:
             missing.append("GROQ_API_KEY")
 
         if missing:
             raise ConfigError(f"Missing environment variables: {', '.join(missing)}")
 
 
-config = Config()
\ No newline at end of file
+class LazyConfig:
+    """
+    Stand-in for the Config instance that reads and validates the environment
+    on first attribute access, so importing app modules has no side effects
+    and does not require credentials.
+    """
+
+    def __init__(self):
+        self._config: Optional[Config] = None
+        self._requirements = {}
+        self._lock = threading.Lock()
+
+    def configure(self, require_llm: bool = True, require_embeddings: bool = True) -> None:
+        """
+        Relax validation for tools that do not use every provider (e.g. the
+        offline retrieval evaluation). Call before the first attribute access.
+        """
+        if self._config is not None:
+            raise RuntimeError("Configuration already loaded")
+        self._requirements = {"require_llm": require_llm, "require_embeddings": require_embeddings}
+
+    def load(self) -> Config:
+        if self._config is None:
+            with self._lock:
+                if self._config is None:
+                    self._config = Config(**self._requirements)
+        return self._config
+
+    def __getattr__(self, name: str):
+        return getattr(self.load(), name)
+
+
+config = LazyConfig()
@@ -0,0 +1,68 @@
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (~4 characters per token for English text).
+    """
+    return max(1, len(text) // 4)
+
+
+def mmr_order(query_vector: Sequence[float], matches: List[Dict], lambda_mult: float = 0.5) -> List[Dict]:
+    """
+    Order matches by Maximal Marginal Relevance:
+    lambda * relevance - (1 - lambda) * max similarity to already selected matches.
+
+    Relevance is the retrieval score scaled to [0, 1] (so fused hybrid ranks
+    are kept), redundancy is the cosine similarity between match vectors.
+    Matches without vectors are never penalized as redundant.
+    """
+    if len(matches) <= 1:
+        return list(matches)
+
+    scores = np.array([match["score"] for match in matches], dtype=np.float32)
+    top = scores.max()
+    relevance = scores / top if top > 0 else np.ones_like(scores)
+
+    dim = len(query_vector)
+    vectors = np.zeros((len(matches), dim), dtype=np.float32)
+    for i, match in enumerate(matches):
+        values = match.get("values")
+        if values is not None and len(values) == dim:
+            vectors[i] = values
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+    similarity = vectors @ vectors.T
+
+    selected: List[int] = []
+    remaining = list(range(len(matches)))
+    redundancy = np.zeros(len(matches), dtype=np.float32)
+    while remaining:
+        mmr = lambda_mult * relevance[remaining] - (1 - lambda_mult) * redundancy[remaining]
+        best = remaining.pop(int(np.argmax(mmr)))
+        selected.append(best)
+        redundancy = np.maximum(redundancy, similarity[best])
+
+    return [matches[i] for i in selected]
+
+
+def select_context(query_vector: Sequence[float], matches: List[Dict], max_chunks: int,
+                   token_budget: int, lambda_mult: float = 0.5) -> List[Dict]:
+    """
+    Pick diverse context for the prompt: MMR-order the over-fetched
+    candidates, then pack them greedily until `max_chunks` or the token
+    budget is reached. The best match is always kept.
+    """
+    selected: List[Dict] = []
+    used = 0
+    for match in mmr_order(query_vector, matches, lambda_mult):
+        if len(selected) >= max_chunks:
+            break
+        cost = estimate_tokens(match["text"])
+        if selected and used + cost > token_budget:
+            continue  # a shorter candidate may still fit
+        selected.append(match)
+        used += cost
+    return selected
@@ -0,0 +1,48 @@
+"""
+Crawl and index in one job: runs ChangiSpider with the streaming item
+pipeline, so pages are cleaned, chunked, embedded and upserted while the
+crawl is still running.
+
+Usage (from backend/):
+    python -m app.crawl_index          # incremental crawl (conditional requests)
+    python -m app.crawl_index --full   # re-download and re-check every page
+"""
+import os
+import sys
+
+SCRAPERS_DIR = "scrapers"
+
+
+def crawl_and_index(full: bool = False) -> None:
+    # The Scrapy project lives in scrapers/; its settings are loaded from there
+    sys.path.insert(0, os.path.abspath(SCRAPERS_DIR))
+    os.environ.setdefault("SCRAPY_SETTINGS_MODULE", "airport_crawler.settings")
+
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+
+    settings = get_project_settings()
+    # Crawl state paths are relative to scrapers/; the backend's data/ is relative to here
+    data_dir = os.path.join(SCRAPERS_DIR, "data")
+    overrides = {
+        "STREAM_INDEX": True,
+        "FINGERPRINTS_PATH": os.path.join(data_dir, "fingerprints.json"),
+        "TOMBSTONES_PATH": os.path.join(data_dir, "tombstones.json"),
+        "FEEDS": {
+            os.path.join(data_dir, "scraped_pages.json"): {
+                "format": "json",
+                "encoding": "utf8",
+                "overwrite": True,
+            }
+        },
+    }
+    for name, value in overrides.items():
+        settings.set(name, value, priority="cmdline")
+
+    process = CrawlerProcess(settings)
+    process.crawl("changi_spider", full="1" if full else None)
+    process.start()
+
+
+if __name__ == "__main__":
+    crawl_and_index(full="--full" in sys.argv[1:])
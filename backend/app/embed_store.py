@@ -1,87 +1,569 @@
 import os
+import sys
 import json
-from typing import List
+import queue
+import hashlib
+import threading
+import multiprocessing
+from collections import deque
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, TextIO
 from langchain.schema import Document
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
 
-from app.utils.cleaner import clean_and_chunk
-from app.vector_store import init_pinecone_index, store_documents_in_pinecone
+from app.config import config
+from app.bm25 import BM25Index
+from app.utils.dedup import NearDuplicateDetector
+from app.metrics import span, stage_summary, INGEST_ITEMS
+from app.utils.cleaner import CONTENT_TYPE_HTML, clean_and_chunk, clean_and_chunk_many
+from app.vector_store import (
+    init_pinecone_index,
+    store_documents_in_pinecone,
+    delete_documents,
+    generate_id,
+    bump_index_version,
+    index_key,
+    get_known_ids,
+    reconcile_known_ids,
+)
 
 SCRAPED_DATA_PATH = os.path.join("scrapers", "data", "scraped_pages.json")
+# Written by the spider next to its feed
+TOMBSTONES_FILE = "tombstones.json"
+FINGERPRINTS_FILE = "fingerprints.json"
 
 
 def load_scraped_data(path: str) -> List[dict]:
     """
     Load JSON data from the specified path.
     """
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    return list(iter_scraped_pages(path))
 
-    if not isinstance(data, list):
-        raise ValueError("Expected a list of pages in scraped JSON.")
-    return data
 
+def iter_scraped_pages(path: str) -> Iterator[dict]:
+    """
+    Incrementally read scraped pages, one at a time.
+    Supports a JSON array (Scrapy "json" feed) and JSON Lines (".jsonl" / ".jl").
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".jl")):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from _iter_json_array(f)
 
-def prepare_documents(pages: List[dict]) -> List[Document]:
+
+def _iter_json_array(f: TextIO, read_size: int = 1 << 16) -> Iterator[dict]:
     """
-    Clean and chunk HTML content into a list of LangChain Document objects.
+    Decode the elements of a top-level JSON array without loading the whole file.
     """
-    documents = []
+    decoder = json.JSONDecoder()
+    buffer, pos, eof, started = "", 0, False, False
 
-    for page in pages:
-        url = page.get("url", "")
-        raw_html = page.get("content", "")
+    while True:
+        # Skip whitespace / separators, reading more input as needed
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            chunk = f.read(read_size)
+            buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
 
-        chunks = clean_and_chunk(raw_html)
+        if pos >= len(buffer):
+            raise ValueError("Expected a list of pages in scraped JSON.")
+
+        if not started:
+            if buffer[pos] != "[":
+                raise ValueError("Expected a list of pages in scraped JSON.")
+            started = True
+            pos += 1
+            continue
+
+        if buffer[pos] == "]":
+            return
+
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # Element spans the buffer boundary: read more and retry
+            chunk = f.read(read_size)
+            buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+            continue
+
+        yield item
+        pos = end
+
+
+def iter_documents(pages: Iterable[dict], workers: int = 1, pages_per_task: int = 8) -> Iterator[Document]:
+    """
+    Lazily clean and chunk pages into LangChain Document objects.
+    With workers > 1, cleaning runs in a process pool; output keeps input order.
+    """
+    for page, chunks in _iter_cleaned_pages(pages, workers, pages_per_task):
+        url = page.get("url", "")
 
         for chunk in chunks:
-            doc = Document(
+            yield Document(
                 page_content=chunk,
                 metadata={"source": url}
             )
-            documents.append(doc)
 
+
+def _iter_cleaned_pages(pages: Iterable[dict], workers: int, pages_per_task: int):
+    """
+    Yield (page, chunks) in input order. In pool mode, pages are sent in
+    groups of `pages_per_task` with a bounded number of groups in flight,
+    so ordering (and therefore chunk ids) is deterministic and memory bounded.
+    """
+    if workers <= 1:
+        for page in pages:
+            with span("clean_chunk", "ingest"):
+                chunks = clean_and_chunk(page.get("content", ""), content_type=page_content_type(page))
+            yield page, chunks
+        return
+
+    # "spawn": the pool is created from a background thread, where fork is unsafe
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        pending = deque()
+        for group in iter_batches(pages, pages_per_task):
+            task = executor.submit(
+                clean_and_chunk_many,
+                [p.get("content", "") for p in group],
+                content_types=[page_content_type(p) for p in group],
+            )
+            pending.append((group, task))
+            if len(pending) >= 2 * workers:
+                group, future = pending.popleft()
+                yield from zip(group, _wait_cleaned(future))
+        while pending:
+            group, future = pending.popleft()
+            yield from zip(group, _wait_cleaned(future))
+
+
+def page_content_type(page: dict) -> str:
+    """
+    Content type of a scraped page; feeds written before the spider recorded it hold HTML.
+    """
+    return page.get("content_type") or CONTENT_TYPE_HTML
+
+
+def _wait_cleaned(future) -> List[List[str]]:
+    # Time the pipeline spends waiting on the cleaning workers
+    with span("clean_chunk", "ingest"):
+        return future.result()
+
+
+def prepare_documents(pages: List[dict]) -> List[Document]:
+    """
+    Clean and chunk HTML content into a list of LangChain Document objects,
+    dropping near-duplicate chunks.
+    """
+    detector = new_near_duplicate_detector()
+    documents = [doc for doc in mark_near_duplicates(iter_documents(pages), detector)
+                 if "duplicate_of" not in doc.metadata]
+    if detector is not None:
+        detector.report()
     return documents
 
 
-def parallel_store_in_pinecone(documents: List[Document], batch_size: int = 200, max_workers: int = 4):
+def new_near_duplicate_detector() -> Optional[NearDuplicateDetector]:
+    if config.NEAR_DUP_THRESHOLD <= 0:
+        return None
+    return NearDuplicateDetector(threshold=config.NEAR_DUP_THRESHOLD)
+
+
+def mark_near_duplicates(documents: Iterable[Document], detector: Optional[NearDuplicateDetector]) -> Iterator[Document]:
+    """
+    Tag chunks that near-duplicate an earlier chunk (boilerplate repeated
+    across pages) with metadata["duplicate_of"] = id of the kept chunk.
+    """
+    for doc in documents:
+        if detector is not None:
+            id_ = generate_id(doc.page_content)
+            with span("near_duplicates", "ingest"):
+                representative = detector.find(doc.page_content, id_, label=doc.metadata.get("source"))
+            if representative is not None and representative != id_:
+                doc.metadata["duplicate_of"] = representative
+        yield doc
+
+
+def drop_near_duplicates(documents: Iterable[Document]) -> Iterator[Document]:
+    return (doc for doc in documents if "duplicate_of" not in doc.metadata)
+
+
+def iter_batches(items: Iterable, batch_size: int) -> Iterator[list]:
+    """
+    Group an iterable into lists of at most `batch_size` items.
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+_DONE = object()
+
+
+def prefetch(items: Iterable, maxsize: int = 256) -> Iterator:
+    """
+    Run an upstream generator in a background thread, handing items over
+    through a bounded queue. Lets pipeline stages overlap while keeping
+    memory bounded; upstream errors are re-raised in the consumer.
+    """
+    buffer: "queue.Queue" = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in items:
+                if stop.is_set():
+                    return
+                buffer.put(item)
+            buffer.put(_DONE)
+        except BaseException as e:
+            buffer.put(e)
+
+    worker = threading.Thread(target=produce, daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        # Unblock a producer waiting on a full queue
+        while worker.is_alive():
+            try:
+                buffer.get_nowait()
+            except queue.Empty:
+                worker.join(timeout=0.05)
+
+
+def parallel_store_in_pinecone(documents: Iterable[Document], batch_size: int = 200, max_workers: int = 4) -> List[Document]:
     """
     Store documents into Pinecone using parallel threads.
+    Batches are submitted as documents arrive, with at most 2 * max_workers
+    batches in flight (backpressure on the producer).
+    Returns the documents of batches that failed to store.
     """
-    doc_batches = [documents[i:i + batch_size] for i in range(0, len(documents), batch_size)]
+    failed: List[Document] = []
+    pending = {}
+
+    def collect(future):
+        try:
+            future.result()
+        except Exception as e:
+            print(f"[ERROR] Failed to store batch: {e}")
+            failed.extend(pending[future])
+        del pending[future]
 
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [executor.submit(store_documents_in_pinecone, batch, batch_size) for batch in doc_batches]
+        for batch in iter_batches(documents, batch_size):
+            if len(pending) >= 2 * max_workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future)
+            pending[executor.submit(store_documents_in_pinecone, batch, batch_size)] = batch
 
-        for future in as_completed(futures):
-            try:
-                future.result()
-            except Exception as e:
-                print(f"[ERROR] Failed to store batch: {e}")
+        for future in as_completed(list(pending)):
+            collect(future)
+
+    return failed
 
 
-def run_rag_pipeline():
+def page_hash(content: str) -> str:
     """
-    Main RAG setup pipeline:
-    - Loads web data
-    - Cleans & chunks
-    - Embeds
-    - Stores in Pinecone (parallelized)
+    Content fingerprint used to detect changed pages between runs.
     """
-    print("[RAG] Loading scraped data...")
-    pages = load_scraped_data(SCRAPED_DATA_PATH)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
 
-    print(f"[RAG] Loaded {len(pages)} pages. Cleaning & chunking...")
-    documents = prepare_documents(pages)
 
-    print(f"[RAG] Prepared {len(documents)} text chunks. Initializing Pinecone...")
+def load_tombstones(path: str) -> Optional[List[str]]:
+    """
+    URLs the last incremental crawl no longer reached. None when there is no
+    tombstone file or the crawl was a full one (its feed lists every page).
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        tombstones = json.load(f)
+    if tombstones.get("full"):
+        return None
+    return tombstones.get("removed", [])
+
+
+def commit_fingerprints(path: str, failed_urls: Set[str]) -> None:
+    """
+    Make the pending fingerprints of the crawl just indexed the spider's
+    reference state. Failed pages lose their entry, so the next crawl
+    downloads and sends them again instead of revalidating them as unchanged.
+    """
+    pending_path = path + ".pending"
+    if not os.path.exists(pending_path):
+        return
+    with open(pending_path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    for url in failed_urls:
+        entries.pop(url, None)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entries, f)
+    os.replace(tmp_path, path)
+    os.remove(pending_path)
+
+
+def load_manifest(path: str) -> Dict[str, dict]:
+    """
+    Load the ingest manifest: {url: {"hash": ..., "chunk_ids": [...]}}.
+    A manifest written for a different index is ignored (full re-index).
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("index", index_key()) != index_key():
+        print(f"[RAG] Manifest belongs to index '{manifest.get('index')}'. Re-indexing everything.")
+        return {}
+    return manifest.get("pages", {})
+
+
+def save_manifest(path: str, pages: Dict[str, dict]) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"index": index_key(), "pages": pages}, f)
+    os.replace(tmp_path, path)
+
+
+class IngestDiff:
+    """
+    Streaming diff of scraped pages against the ingest manifest.
+    `changed_pages` yields only pages that are new or whose content changed
+    (every page with rescan=True), recording what it saw; `chunk_ids` is
+    filled in as documents are produced.
+    With `tombstones` the scraped pages are a delta (an incremental crawl):
+    pages missing from it are unchanged and only tombstoned URLs are removed.
+    """
+
+    def __init__(self, manifest: Dict[str, dict], rescan: bool = False, tombstones: Optional[Iterable[str]] = None):
+        self.manifest = manifest
+        self.rescan = rescan
+        self.tombstones = set(tombstones) if tombstones is not None else None
+        self.hashes: Dict[str, str] = {}
+        self.new: List[str] = []
+        self.changed: List[str] = []
+        self.unchanged: List[str] = []
+        self.chunk_ids: Dict[str, List[str]] = {}
+
+    def changed_pages(self, pages: Iterable[dict]) -> Iterator[dict]:
+        for page in pages:
+            url = page.get("url", "")
+            if url in self.hashes:
+                continue  # first copy of a URL wins
+            self.hashes[url] = page_hash(page.get("content", ""))
+
+            previous = self.manifest.get(url)
+            if not self.rescan and previous is not None and previous.get("hash") == self.hashes[url]:
+                self.unchanged.append(url)
+                continue
+            (self.changed if previous is not None else self.new).append(url)
+            self.chunk_ids[url] = []
+            yield page
+
+    def track(self, documents: Iterable[Document]) -> Iterator[Document]:
+        for doc in documents:
+            # A near-duplicate page chunk references the chunk kept in its place
+            id_ = doc.metadata.get("duplicate_of") or generate_id(doc.page_content)
+            self.chunk_ids[doc.metadata.get("source", "")].append(id_)
+            yield doc
+
+    @property
+    def removed(self) -> List[str]:
+        if self.tombstones is not None:
+            return [url for url in self.manifest if url in self.tombstones and url not in self.hashes]
+        return [url for url in self.manifest if url not in self.hashes]
+
+    @property
+    def not_crawled(self) -> List[str]:
+        """
+        Pages an incremental crawl left out of its feed because they did not change.
+        """
+        if self.tombstones is None:
+            return []
+        return [url for url in self.manifest if url not in self.hashes and url not in self.tombstones]
+
+    def next_manifest(self, failed_urls: Set[str]) -> Dict[str, dict]:
+        """
+        Manifest after this run; failed pages keep their previous entry so they are retried.
+        """
+        pages = {url: self.manifest[url] for url in self.unchanged + self.not_crawled}
+        for url, ids in self.chunk_ids.items():
+            if url in failed_urls:
+                if url in self.manifest:
+                    pages[url] = self.manifest[url]
+            else:
+                pages[url] = {"hash": self.hashes[url], "chunk_ids": ids}
+        return pages
+
+
+def load_bm25_index() -> Optional[BM25Index]:
+    """
+    Keyword index to update during ingestion; None when BM25 is disabled.
+    """
+    if not config.BM25_INDEX_PATH:
+        return None
+    return BM25Index.load(config.BM25_INDEX_PATH, index_key()) or BM25Index()
+
+
+def index_keywords(documents: Iterable[Document], bm25: Optional[BM25Index]) -> Iterator[Document]:
+    """
+    Add documents to the BM25 index as they stream past.
+    """
+    for doc in documents:
+        if bm25 is not None:
+            with span("bm25_index", "ingest"):
+                bm25.add(generate_id(doc.page_content), doc.page_content)
+        yield doc
+
+
+def run_rag_pipeline(path: str = SCRAPED_DATA_PATH, reconcile: bool = False):
+    """
+    Main RAG setup pipeline (incremental, streaming):
+    - Reads scraped pages one at a time and diffs them against the ingest manifest
+    - Cleans & chunks new or changed pages in a background stage
+    - Drops near-duplicate chunks (boilerplate repeated across pages)
+    - Embeds & stores batches in Pinecone as they fill (parallelized)
+    - Deletes chunks of changed or vanished pages that are no longer referenced
+    - Keeps the BM25 keyword index in step with the vector index
+    Pass reconcile=True (--reconcile) to rebuild the local known-id set from the index first.
+    When the tombstone list next to the feed comes from an incremental crawl, the feed
+    is a delta: only the pages in it are updated and only the listed URLs are removed.
+    """
+    crawl_dir = os.path.dirname(path)
+    tombstones_path = os.path.join(crawl_dir, TOMBSTONES_FILE)
+    vanished = load_tombstones(tombstones_path)
+    if vanished is not None:
+        print(f"[RAG] Incremental crawl feed: {len(vanished)} vanished page(s) in {tombstones_path}.")
+    print(f"[RAG] Streaming scraped data from {path} (parse → clean → chunk → embed → upsert)...")
+    ingest_pages(
+        iter_scraped_pages(path),
+        reconcile=reconcile,
+        tombstones=(lambda: vanished) if vanished is not None else None,
+        fingerprints_path=os.path.join(crawl_dir, FINGERPRINTS_FILE),
+    )
+
+
+def ingest_pages(pages: Iterable[dict], reconcile: bool = False,
+                 tombstones: Optional[Callable[[], Optional[List[str]]]] = None,
+                 fingerprints_path: Optional[str] = None) -> None:
+    """
+    Index a stream of scraped pages (see run_rag_pipeline); `pages` may be fed
+    by a running crawl. `tombstones` marks the pages as an incremental crawl's
+    delta: it is called once the last page is consumed and returns the URLs
+    to remove, or None when the pages turned out to be a full crawl.
+    The crawl's pending fingerprints (`fingerprints_path`) are committed once
+    the pages are indexed.
+    """
+    manifest = load_manifest(config.INGEST_MANIFEST_PATH)
+    bm25 = load_bm25_index()
+
+    # No keyword index yet for an existing corpus: re-chunk every page to build it
+    # (chunks already in the vector index are not embedded again)
+    rescan = bm25 is not None and not len(bm25) and bool(manifest)
+    if rescan:
+        print("[RAG] No BM25 index for the existing corpus. Re-chunking all pages to build it...")
+        if tombstones is not None:
+            print("[RAG] ⚠️ An incremental feed only holds changed pages: run a full crawl (-a full=1) to index all of them.")
+    diff = IngestDiff(manifest, rescan=rescan)
+
+    print("[RAG] Initializing Pinecone...")
     init_pinecone_index()
+    if reconcile:
+        reconcile_known_ids()
+
+    print(f"[RAG] Cleaning & chunking with {max(config.INGEST_WORKERS, 1)} worker process(es)...")
+    pages = diff.changed_pages(pages)
+    detector = new_near_duplicate_detector()
+    documents = iter_documents(pages, config.INGEST_WORKERS, config.INGEST_TASK_PAGES)
+    documents = diff.track(mark_near_duplicates(documents, detector))
+    documents = prefetch(index_keywords(drop_near_duplicates(documents), bm25))
+    with span("stream", "ingest"):
+        failed = parallel_store_in_pinecone(documents, batch_size=200, max_workers=4)
+    failed_urls = {doc.metadata.get("source", "") for doc in failed}
+    INGEST_ITEMS.labels("pages_scanned").inc(len(diff.hashes))
+    INGEST_ITEMS.labels("pages_failed").inc(len(failed_urls))
+    if tombstones is not None:
+        vanished = tombstones()
+        diff.tombstones = set(vanished) if vanished is not None else None
+
+    removed = diff.removed
+    get_known_ids().save()
+    if detector is not None:
+        detector.report()
+
+    print(f"[RAG] Scanned {len(diff.hashes)} pages: {len(diff.new)} new, {len(diff.changed)} changed, "
+          f"{len(diff.unchanged) + len(diff.not_crawled)} unchanged, {len(removed)} removed.")
+
+    if not diff.chunk_ids and not removed:
+        print("[RAG] ✅ Index is up to date. Nothing to do.")
+        if fingerprints_path:
+            commit_fingerprints(fingerprints_path, failed_urls)
+        print_stage_summary()
+        return
+
+    next_manifest = diff.next_manifest(failed_urls)
+
+    # Chunk ids are content hashes and may be shared across pages: only delete unreferenced ones
+    previous_ids = {id_ for entry in manifest.values() for id_ in entry["chunk_ids"]}
+    live_ids = {id_ for entry in next_manifest.values() for id_ in entry["chunk_ids"]}
+    stale_ids = sorted(previous_ids - live_ids)
+    delete_documents(stale_ids)
+    get_known_ids().save()
 
-    print(f"[RAG] Storing chunks into Pinecone in parallel...")
-    parallel_store_in_pinecone(documents, batch_size=200, max_workers=4)
+    with span("save_state", "ingest"):
+        if bm25 is not None:
+            # Drops stale chunks and those of failed pages (re-added when they are retried)
+            for id_ in [id_ for id_ in bm25.texts if id_ not in live_ids]:
+                bm25.remove(id_)
+            bm25.save(config.BM25_INDEX_PATH, index_key())
 
+        save_manifest(config.INGEST_MANIFEST_PATH, next_manifest)
+        if fingerprints_path:
+            commit_fingerprints(fingerprints_path, failed_urls)
+
+    # Invalidates cached answers in running API workers
+    bump_index_version()
+
+    print(f"[RAG] Diff: +{len(live_ids - previous_ids)} chunks, -{len(stale_ids)} chunks, "
+          f"{len(failed_urls)} pages failed and will be retried.")
+    print_stage_summary()
     print("[RAG] ✅ Pipeline completed successfully.")
 
 
+def print_stage_summary() -> None:
+    """
+    Print where the ingest run spent its time (summed over threads, so
+    overlapping stages can add up to more than the wall clock).
+    """
+    print("[RAG] Stage timings:")
+    for stage, count, seconds in sorted(stage_summary("ingest"), key=lambda row: -row[2]):
+        print(f"[RAG]   {stage:<16} {seconds:9.2f}s over {count} call(s)")
+
+
 if __name__ == "__main__":
-    run_rag_pipeline()
+    args = [arg for arg in sys.argv[1:] if arg != "--reconcile"]
+    run_rag_pipeline(args[0] if args else SCRAPED_DATA_PATH, reconcile="--reconcile" in sys.argv[1:])
@@ -0,0 +1,82 @@
+import os
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+
+def content_hash(text: str) -> str:
+    """
+    Content address of a chunk (same value as the chunk id in the vector index).
+    """
+    return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache in SQLite keyed by (chunk hash, model name).
+    Vectors are stored as float32 blobs. Safe to share across threads:
+    each thread gets its own connection to the WAL-mode database.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS embeddings (
+            chunk_hash TEXT NOT NULL,
+            model TEXT NOT NULL,
+            vector BLOB NOT NULL,
+            PRIMARY KEY (chunk_hash, model)
+        ) WITHOUT ROWID
+    """
+    _MAX_PARAMS = 500  # stay below SQLite's bound-parameter limit
+
+    def __init__(self, path: str, model_name: str):
+        self.path = path
+        self.model_name = model_name
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(self._SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, hashes: Sequence[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        conn = self._connection()
+        unique = list(dict.fromkeys(hashes))
+        for i in range(0, len(unique), self._MAX_PARAMS):
+            group = unique[i:i + self._MAX_PARAMS]
+            placeholders = ",".join("?" * len(group))
+            rows = conn.execute(
+                f"SELECT chunk_hash, vector FROM embeddings WHERE model = ? AND chunk_hash IN ({placeholders})",
+                [self.model_name, *group],
+            )
+            for chunk_hash, blob in rows:
+                found[chunk_hash] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, items: Iterable[Tuple[str, Sequence[float]]]) -> None:
+        rows = [
+            (chunk_hash, self.model_name, np.asarray(vector, dtype=np.float32).tobytes())
+            for chunk_hash, vector in items
+        ]
+        if not rows:
+            return
+        with self._connection() as conn:
+            conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+
+    def __len__(self) -> int:
+        (count,) = self._connection().execute(
+            "SELECT COUNT(*) FROM embeddings WHERE model = ?", [self.model_name]
+        ).fetchone()
+        return count
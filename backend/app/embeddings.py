@@ -1,65 +1,289 @@
-import time
-from typing import List
+import re
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Optional, Tuple
 import numpy as np
 from tenacity import retry, wait_random_exponential, stop_after_attempt
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from app.config import config
+from app.utils.cache import LRUTTLCache
+from app.utils.lazy import once
+from app.metrics import stats_collector
+from app.utils.rate_limit import TokenBucket
+from app.utils.batching import MicroBatcher
+from app.embedding_cache import EmbeddingCache, content_hash
 
+EMBEDDING_MODEL_NAME = "models/text-embedding-004"
+
+
+def _build_model(task_type: str):
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    options = {}
+    if config.GEMINI_TRANSPORT:
+        options["transport"] = config.GEMINI_TRANSPORT
+    if config.GEMINI_API_ENDPOINT:
+        options["client_options"] = {"api_endpoint": config.GEMINI_API_ENDPOINT}
+    return GoogleGenerativeAIEmbeddings(
+        model=EMBEDDING_MODEL_NAME,
+        task_type=task_type,
+        google_api_key=config.GEMINI_API_KEY,
+        **options,
+    )
+
+
+@once
+def get_document_model():
+    """
+    Document-side embedding client, created on first use.
+    """
+    return _build_model("retrieval_document")
+
+
+@once
+def get_query_model():
+    """
+    Query-side client, created once and reused for every user query.
+    """
+    return _build_model("retrieval_query")
+
+
+def _rest_transport() -> bool:
+    # The async Gemini client only speaks gRPC; with REST, async calls run the sync client in a thread
+    return config.GEMINI_TRANSPORT == "rest"
+
+
+@once
+def get_query_embedding_cache() -> LRUTTLCache:
+    return LRUTTLCache(
+        maxsize=config.EMBED_CACHE_SIZE,
+        ttl=config.EMBED_CACHE_TTL,
+    )
+
+
+class EmbeddingError(Exception):
+    """
+    Raised when some embedding batches still fail after retries.
+    `results` holds the embeddings in input order, with None for failed texts;
+    `failed_batches` lists (start, end, error) input ranges.
+    """
+
+    def __init__(self, results: List[Optional[List[float]]], failed_batches: List[Tuple[int, int, Exception]]):
+        self.results = results
+        self.failed_batches = failed_batches
+        ranges = ", ".join(f"{start}-{end}" for start, end, _ in failed_batches)
+        super().__init__(f"{len(failed_batches)} embedding batch(es) failed after retries: {ranges}")
+
+
+class EmbeddingScheduler:
+    """
+    Shared, concurrent document-embedding scheduler.
+
+    Splits texts into batches, runs at most `max_concurrency` requests at a
+    time across all callers, paces them with a token bucket matching the
+    provider quota, retries transient errors, and returns results in input
+    order. Batches that still fail are reported via EmbeddingError, never dropped.
+    """
+
+    def __init__(self, embed_fn: Callable[[List[str]], List[List[float]]], batch_size: int = 32,
+                 max_concurrency: int = 4, requests_per_minute: float = 0, max_attempts: int = 5):
+        self.batch_size = batch_size
+        self._bucket = TokenBucket(rate=requests_per_minute / 60.0, capacity=max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="embed")
+        self._embed_with_retry = retry(
+            wait=wait_random_exponential(min=2, max=20),
+            stop=stop_after_attempt(max_attempts),
+            reraise=True,
+        )(self._rate_limited(embed_fn))
+
+    def _rate_limited(self, embed_fn):
+        def call(batch: List[str]) -> List[List[float]]:
+            self._bucket.acquire()  # every attempt, including retries, spends quota
+            embeddings = embed_fn(batch)
+            if len(embeddings) != len(batch):
+                raise ValueError(f"Expected {len(batch)} embeddings, got {len(embeddings)}")
+            return embeddings
+        return call
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+
+        starts = range(0, len(texts), self.batch_size)
+        futures = {
+            self._executor.submit(self._embed_with_retry, texts[start:start + self.batch_size]): start
+            for start in starts
+        }
+
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        failed: List[Tuple[int, int, Exception]] = []
+        for done, future in enumerate(as_completed(futures), start=1):
+            start = futures[future]
+            end = min(start + self.batch_size, len(texts))
+            try:
+                results[start:end] = future.result()
+                print(f"[Embed] Batch {done} / {len(futures)} done")
+            except Exception as e:
+                print(f"[Embedding Error] Batch {start}-{end} failed after retries: {e}")
+                failed.append((start, end, e))
+
+        if failed:
+            raise EmbeddingError(results, sorted(failed, key=lambda f: f[0]))
+        return results
 
-_embedding_model = GoogleGenerativeAIEmbeddings(
-    model="models/text-embedding-004",
-    task_type="retrieval_document",
-    google_api_key=config.GEMINI_API_KEY,
-)
+
+@once
+def _get_scheduler() -> EmbeddingScheduler:
+    return EmbeddingScheduler(
+        lambda batch: get_document_model().embed_documents(batch),
+        batch_size=config.EMBED_BATCH_SIZE,
+        max_concurrency=config.EMBED_CONCURRENCY,
+        requests_per_minute=config.EMBED_REQUESTS_PER_MINUTE,
+    )
 
 
-@retry(wait=wait_random_exponential(min=2, max=20), stop=stop_after_attempt(5))
-def _embed_batch(batch: List[str]) -> List[List[float]]:
+@once
+def _get_embedding_cache() -> Optional[EmbeddingCache]:
     """
-    Embed a batch of documents using Google Generative AI embeddings.
-    Retries on transient API errors.
+    Content-addressed store of document embeddings; re-indexing reuses it instead of the API.
     """
-    return _embedding_model.embed_documents(batch)
+    if not config.EMBED_CACHE_PATH:
+        return None
+    return EmbeddingCache(config.EMBED_CACHE_PATH, EMBEDDING_MODEL_NAME)
 
 
 def embed_texts(texts: List[str], batch_size: int = 32) -> List[List[float]]:
     """
     Embed a list of texts with batching and retry logic.
+    Texts already in the persistent embedding cache are not sent to the API.
+    Results are aligned with `texts`; raises EmbeddingError if any batch
+    still fails after retries. `batch_size` is kept for compatibility;
+    the scheduler uses EMBED_BATCH_SIZE.
     """
     if not texts:
         return []
+    scheduler = _get_scheduler()
+    embedding_cache = _get_embedding_cache()
+    if embedding_cache is None:
+        return scheduler.embed(texts)
+
+    hashes = [content_hash(text) for text in texts]
+    cached = embedding_cache.get_many(hashes)
+    missing = [i for i, h in enumerate(hashes) if h not in cached]
+    print(f"[Embed] {len(texts) - len(missing)} / {len(texts)} embeddings served from cache")
 
-    all_embeddings = []
+    error = None
+    try:
+        fresh = scheduler.embed([texts[i] for i in missing])
+    except EmbeddingError as e:
+        fresh, error = e.results, e
+
+    embedding_cache.put_many(
+        (hashes[i], vector) for i, vector in zip(missing, fresh) if vector is not None
+    )
 
-    for i in range(0, len(texts), batch_size):
-        batch = texts[i : i + batch_size]
-        print(f"[Embed] Processing batch {i // batch_size + 1} / {len(texts) // batch_size + 1}")
+    results: List[Optional[List[float]]] = [cached.get(h) for h in hashes]
+    for i, vector in zip(missing, fresh):
+        results[i] = vector
 
-        try:
-            embeddings = _embed_batch(batch)
-            all_embeddings.extend(embeddings)
-        except Exception as e:
-            print(f"[Embedding Error] Batch {i}-{i+len(batch)} failed: {e}")
-            time.sleep(5) 
+    if error is not None:
+        # Map failed ranges back to positions in `texts`
+        failed = [(missing[start], missing[end - 1] + 1, e) for start, end, e in error.failed_batches]
+        raise EmbeddingError(results, failed)
+    return results
+
+
+def normalize_query(query: str) -> str:
+    """
+    Canonical form of a query used for cache keys: case- and whitespace-insensitive.
+    """
+    return re.sub(r"\s+", " ", query).strip().lower()
 
-    return all_embeddings
+
+def _query_cache_key(query: str) -> tuple:
+    return (normalize_query(query), EMBEDDING_MODEL_NAME)
+
+
+def _remember_query_embedding(key: tuple, values: List[float]) -> np.ndarray:
+    embedding = np.array(values)
+    embedding.setflags(write=False)  # shared between callers via the cache
+    get_query_embedding_cache().set(key, embedding)
+    return embedding
 
 
 def get_gemini_embedding(query: str) -> np.ndarray:
     """
     Generate embedding for a user query using Gemini.
+    Repeated queries are served from an in-memory LRU+TTL cache.
     """
-    model = GoogleGenerativeAIEmbeddings(
-        model="models/text-embedding-004",
-        task_type="retrieval_query",
-        google_api_key=config.GEMINI_API_KEY,
+    key = _query_cache_key(query)
+    cached = get_query_embedding_cache().get(key)
+    if cached is not None:
+        return cached
+
+    return _remember_query_embedding(key, get_query_model().embed_query(query))
+
+
+async def aget_gemini_embedding(query: str) -> np.ndarray:
+    """
+    Async variant of get_gemini_embedding; shares the same client and cache.
+    Cache misses from concurrent requests are embedded in micro-batches.
+    """
+    key = _query_cache_key(query)
+    cached = get_query_embedding_cache().get(key)
+    if cached is not None:
+        return cached
+
+    batcher = _get_query_batcher()
+    if batcher is not None:
+        return _remember_query_embedding(key, await batcher.submit(query))
+    if _rest_transport():
+        return _remember_query_embedding(key, await asyncio.to_thread(get_query_model().embed_query, query))
+    return _remember_query_embedding(key, await get_query_model().aembed_query(query))
+
+
+async def _aembed_query_batch(queries: List[str]) -> List[List[float]]:
+    """
+    One embedding request for the distinct queries of a micro-batch.
+    """
+    unique = list(dict.fromkeys(queries))
+    if _rest_transport():
+        vectors = await asyncio.to_thread(get_query_model().embed_documents, unique, task_type="retrieval_query")
+    else:
+        vectors = await get_query_model().aembed_documents(unique, task_type="retrieval_query")
+    by_query = dict(zip(unique, vectors))
+    return [by_query[query] for query in queries]
+
+
+@once
+def _get_query_batcher() -> Optional[MicroBatcher]:
+    """
+    Concurrent cache-missing queries share batched embedding calls (QUERY_BATCH_SIZE <= 1 disables).
+    """
+    if config.QUERY_BATCH_SIZE <= 1:
+        return None
+    return MicroBatcher(
+        _aembed_query_batch,
+        max_batch_size=config.QUERY_BATCH_SIZE,
+        max_wait=config.QUERY_BATCH_WAIT_MS / 1000,
     )
-    embedding = model.embed_query(query)
-    return np.array(embedding)
+
+
+def query_batch_stats() -> dict:
+    """
+    Achieved query-embedding batch sizes (empty when batching is disabled).
+    """
+    batcher = _get_query_batcher() if _get_query_batcher.initialized() else None
+    return batcher.stats() if batcher is not None else {}
+
+
+stats_collector.add_cache(
+    "query_embedding",
+    lambda: get_query_embedding_cache().stats() if get_query_embedding_cache.initialized() else None,
+)
+stats_collector.add_source("query_embedding_batches", query_batch_stats)
 
 
 def get_embedding_model_name() -> str:
     """
     Return the model identifier used for embeddings.
     """
-    return "models/text-embedding-004"
+    return EMBEDDING_MODEL_NAME
@@ -0,0 +1,95 @@
+import os
+import threading
+from typing import Iterable, List, Sequence, Set
+
+import numpy as np
+
+_ID_DTYPE = "S32"  # md5 hex digests, 32 bytes each
+
+
+class KnownIds:
+    """
+    Locally persisted set of chunk ids known to be in the vector index.
+
+    Stored as a sorted array of fixed-width hex ids (membership via binary
+    search) plus a small set of ids added since the last save. Replaces a
+    remote fetch per batch with an in-memory lookup; `reconcile` rebuilds it
+    from the index on demand.
+    """
+
+    def __init__(self, path: str, index_key: str):
+        self.path = path
+        self.index_key = index_key
+        self.loaded = False
+        self._sorted = np.array([], dtype=_ID_DTYPE)
+        self._added: Set[bytes] = set()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with np.load(self.path) as data:
+            if str(data["index"]) != self.index_key:
+                print(f"[KnownIds] {self.path} belongs to index '{data['index']}'. Ignoring it.")
+                return
+            self._sorted = data["ids"].astype(_ID_DTYPE)
+        self.loaded = True
+
+    def save(self) -> None:
+        with self._lock:
+            self._merge()
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = self.path + ".tmp.npz"
+            np.savez(tmp_path, ids=self._sorted, index=np.array(self.index_key))
+            os.replace(tmp_path, self.path)
+            self.loaded = True
+
+    def _merge(self) -> None:
+        if self._added:
+            added = np.array(sorted(self._added), dtype=_ID_DTYPE)
+            self._sorted = np.union1d(self._sorted, added)
+            self._added.clear()
+
+    @staticmethod
+    def _encode(ids: Iterable[str]) -> List[bytes]:
+        return [id_.encode("ascii") for id_ in ids]
+
+    def contains_many(self, ids: Sequence[str]) -> List[bool]:
+        keys = self._encode(ids)
+        if not keys:
+            return []
+        with self._lock:
+            query = np.array(keys, dtype=_ID_DTYPE)
+            positions = np.searchsorted(self._sorted, query)
+            found = positions < len(self._sorted)
+            found[found] = self._sorted[positions[found]] == query[found]
+            return [bool(hit) or key in self._added for hit, key in zip(found, keys)]
+
+    def add_many(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            self._added.update(self._encode(ids))
+
+    def discard_many(self, ids: Iterable[str]) -> None:
+        keys = self._encode(ids)
+        with self._lock:
+            self._added.difference_update(keys)
+            if keys:
+                self._sorted = np.setdiff1d(self._sorted, np.array(keys, dtype=_ID_DTYPE))
+
+    def reconcile(self, id_batches: Iterable[Sequence[str]]) -> None:
+        """
+        Replace the local set with the ids actually present in the index.
+        """
+        ids = np.array([key for batch in id_batches for key in self._encode(batch)], dtype=_ID_DTYPE)
+        with self._lock:
+            self._sorted = np.unique(ids)
+            self._added.clear()
+        self.save()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._merge()
+            return len(self._sorted)
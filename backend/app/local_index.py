@@ -0,0 +1,361 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # not POSIX: writers are only serialized within a process
+    fcntl = None
+
+VECTORS_FILE = "vectors.f32"
+INDEX_FILE = "index.json"
+LOG_FILE = "index.log"
+LOCK_FILE = "index.lock"
+
+
+@dataclass
+class LocalVector:
+    """
+    A stored vector, mirroring the shape of Pinecone's fetch results.
+    """
+    id: str
+    values: List[float]
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class LocalFetchResponse:
+    vectors: Dict[str, LocalVector]
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class LocalVectorIndex:
+    """
+    In-process vector index backed by a contiguous float32 matrix on disk.
+
+    Rows are L2-normalized on write, so cosine similarity is a single
+    matrix-vector product over the memory-mapped matrix. Exposes the same
+    `upsert` / `fetch` / `query` operations used against a Pinecone index.
+
+    Ids and metadata live in a snapshot (index.json) plus an append-only log
+    of upserts, so an upsert writes only its own rows; the snapshot is
+    rewritten when rows are deleted. Writers in different processes are
+    serialized by a lock file.
+    """
+
+    def __init__(self, directory: str, dimension: int):
+        self.directory = directory
+        self.dimension = dimension
+        self._vectors_path = os.path.join(directory, VECTORS_FILE)
+        self._index_path = os.path.join(directory, INDEX_FILE)
+        self._log_path = os.path.join(directory, LOG_FILE)
+        self._lock_path = os.path.join(directory, LOCK_FILE)
+
+        self._lock = threading.RLock()
+        self._ids: List[str] = []
+        self._metadata: List[Dict[str, Any]] = []
+        self._positions: Dict[str, int] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._loaded_mtime: Optional[int] = None
+        self._log_offset = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    # ---------- Persistence ---------- #
+
+    def _index_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self._index_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _log_size(self) -> int:
+        try:
+            return os.stat(self._log_path).st_size
+        except FileNotFoundError:
+            return 0
+
+    @contextmanager
+    def _write_lock(self):
+        """
+        Serialize writers across threads and processes (e.g. an ingest run
+        and a second one started by mistake).
+        """
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self._lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self) -> None:
+        """
+        (Re)load ids/metadata (snapshot + upsert log) and memory-map the vector matrix.
+        """
+        mtime = self._index_mtime()
+        if mtime is None:
+            self._ids, self._metadata, self._positions = [], [], {}
+            self._matrix = np.zeros((0, self.dimension), dtype=np.float32)
+            self._loaded_mtime = None
+            self._log_path = os.path.join(self.directory, LOG_FILE)
+            self._log_offset = 0
+            return
+
+        with open(self._index_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+
+        if state.get("dimension") != self.dimension:
+            raise ValueError(
+                f"Local index at {self.directory} has dimension {state.get('dimension')}, expected {self.dimension}"
+            )
+
+        self._vectors_path = os.path.join(self.directory, state.get("vectors_file", VECTORS_FILE))
+        self._ids = state["ids"]
+        self._metadata = state["metadata"]
+        self._positions = {id_: i for i, id_ in enumerate(self._ids)}
+        self._log_path = os.path.join(self.directory, state.get("log_file", LOG_FILE))
+        self._log_offset = 0
+        self._replay_log()
+        self._matrix = self._map_matrix(len(self._ids))
+        self._loaded_mtime = mtime
+
+    def _replay_log(self) -> None:
+        """
+        Apply upserts appended to the log since the last read. A trailing
+        partial line (a write in progress or interrupted) is left for later.
+        """
+        if self._log_size() <= self._log_offset:
+            return
+        with open(self._log_path, "rb") as f:
+            f.seek(self._log_offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            id_, metadata = json.loads(line)
+            self._apply(id_, metadata)
+        self._log_offset += end
+
+    def _apply(self, id_: str, metadata: Dict[str, Any]) -> int:
+        position = self._positions.get(id_)
+        if position is None:
+            position = len(self._ids)
+            self._positions[id_] = position
+            self._ids.append(id_)
+            self._metadata.append(metadata)
+        else:
+            self._metadata[position] = metadata
+        return position
+
+    def _map_matrix(self, rows: int) -> np.ndarray:
+        if rows == 0:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dimension))
+
+    def _save_state(self) -> None:
+        """
+        Write a full snapshot with a new, empty upsert log. Readers replay the
+        log named in the snapshot they loaded, so the old log is never
+        applied on top of the new snapshot.
+        """
+        old_log_path = self._log_path
+        log_path = os.path.join(self.directory, f"index.{time.time_ns()}.log")
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "dimension": self.dimension,
+                "vectors_file": os.path.basename(self._vectors_path),
+                "log_file": os.path.basename(log_path),
+                "ids": self._ids,
+                "metadata": self._metadata,
+            }, f)
+        os.replace(tmp_path, self._index_path)
+        self._loaded_mtime = self._index_mtime()
+        self._log_path, self._log_offset = log_path, 0
+        if old_log_path != log_path and os.path.exists(old_log_path):
+            os.remove(old_log_path)
+
+    def _append_log(self, records: List[Tuple[str, Dict[str, Any]]]) -> None:
+        lines = b"".join(json.dumps([id_, metadata]).encode("utf-8") + b"\n" for id_, metadata in records)
+        mode = "r+b" if os.path.exists(self._log_path) else "wb"
+        with open(self._log_path, mode) as f:
+            # Drop a partial line left by an interrupted write
+            f.seek(self._log_offset)
+            f.truncate()
+            f.write(lines)
+        self._log_offset += len(lines)
+
+    def _refresh_if_changed(self) -> None:
+        """
+        Pick up writes made by another process (e.g. a re-ingest run).
+        """
+        if self._index_mtime() != self._loaded_mtime:
+            self._load()
+        elif self._log_size() > self._log_offset:
+            self._replay_log()
+            self._matrix = self._map_matrix(len(self._ids))
+
+    # ---------- Index operations ---------- #
+
+    def upsert(self, vectors: Iterable[Union[Tuple, Dict[str, Any]]]) -> Dict[str, int]:
+        """
+        Insert or overwrite vectors given as (id, values, metadata) tuples
+        or {"id", "values", "metadata"} dicts.
+        """
+        records = [
+            (v["id"], v["values"], v.get("metadata") or {}) if isinstance(v, dict)
+            else (v[0], v[1], v[2] if len(v) > 2 else {})
+            for v in vectors
+        ]
+        if not records:
+            return {"upserted_count": 0}
+
+        matrix = _normalize_rows(np.asarray([values for _, values, _ in records], dtype=np.float32))
+        if matrix.shape[1] != self.dimension:
+            raise ValueError(f"Vector dimension {matrix.shape[1]} does not match index dimension {self.dimension}")
+
+        with self._write_lock():
+            self._refresh_if_changed()
+            if self._loaded_mtime is None:
+                self._save_state()  # first write: snapshot naming the upsert log
+
+            existing_rows = len(self._ids)
+            updates: Dict[int, int] = {}
+            appended: Dict[int, int] = {}
+            for row, (id_, _, metadata) in enumerate(records):
+                position = self._apply(id_, metadata)
+                # Last occurrence of an id within the batch wins
+                (updates if position < existing_rows else appended)[position] = row
+
+            if updates:
+                writable = np.memmap(self._vectors_path, dtype=np.float32, mode="r+",
+                                     shape=(existing_rows, self.dimension))
+                for position, row in updates.items():
+                    writable[position] = matrix[row]
+                writable.flush()
+                del writable
+
+            if appended:
+                # Write at the end of the known rows (not the file end), so rows left
+                # behind by an interrupted write can never shift the id -> row mapping.
+                offset = existing_rows * self.dimension * 4
+                mode = "r+b" if os.path.exists(self._vectors_path) else "wb"
+                with open(self._vectors_path, mode) as f:
+                    f.seek(offset)
+                    f.write(np.ascontiguousarray(matrix[list(appended.values())]).tobytes())
+                    f.truncate()
+
+            # The log makes the new rows visible, so it is written after the vectors
+            self._append_log([(id_, metadata) for id_, _, metadata in records])
+            self._matrix = self._map_matrix(len(self._ids))
+
+        return {"upserted_count": len(records)}
+
+    def delete(self, ids: Sequence[str]) -> None:
+        """
+        Remove vectors by id. Surviving rows are compacted into a new matrix
+        file, and the state is swapped atomically, so concurrent readers in
+        other processes never see a partially written matrix.
+        """
+        with self._write_lock():
+            self._refresh_if_changed()
+            doomed = {self._positions[id_] for id_ in ids if id_ in self._positions}
+            if not doomed:
+                return
+
+            keep = [i for i in range(len(self._ids)) if i not in doomed]
+            old_path = self._vectors_path
+            new_path = os.path.join(self.directory, f"vectors.{time.time_ns()}.f32")
+            with open(new_path, "wb") as f:
+                if keep:
+                    f.write(np.ascontiguousarray(self._matrix[keep]).tobytes())
+
+            self._ids = [self._ids[i] for i in keep]
+            self._metadata = [self._metadata[i] for i in keep]
+            self._positions = {id_: i for i, id_ in enumerate(self._ids)}
+            self._vectors_path = new_path
+            self._save_state()
+            self._matrix = self._map_matrix(len(self._ids))
+
+            if os.path.exists(old_path):
+                os.remove(old_path)
+
+    def fetch(self, ids: Sequence[str]) -> LocalFetchResponse:
+        with self._lock:
+            self._refresh_if_changed()
+            found = {}
+            for id_ in ids:
+                position = self._positions.get(id_)
+                if position is not None:
+                    found[id_] = LocalVector(
+                        id=id_,
+                        values=self._matrix[position].tolist(),
+                        metadata=self._metadata[position],
+                    )
+            return LocalFetchResponse(vectors=found)
+
+    def query(self, vector: Sequence[float], top_k: int = 5, include_metadata: bool = True,
+              include_values: bool = False) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Vectorized top-k cosine search over all stored rows.
+        """
+        with self._lock:
+            self._refresh_if_changed()
+            matrix, ids, metadata = self._matrix, self._ids, self._metadata
+
+        total = matrix.shape[0]
+        if total == 0 or top_k <= 0:
+            return {"matches": []}
+
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        scores = matrix @ query
+        k = min(top_k, total)
+        if k < total:
+            top = np.argpartition(scores, total - k)[total - k:]
+        else:
+            top = np.arange(total)
+        top = top[np.argsort(scores[top])[::-1]]
+
+        matches = []
+        for position in top:
+            match = {"id": ids[position], "score": float(scores[position])}
+            if include_metadata:
+                match["metadata"] = metadata[position]
+            if include_values:
+                match["values"] = matrix[position].tolist()
+            matches.append(match)
+        return {"matches": matches}
+
+    def list(self, limit: int = 1000) -> Iterator[List[str]]:
+        """
+        Yield all stored ids in pages, like Pinecone's `Index.list`.
+        """
+        with self._lock:
+            self._refresh_if_changed()
+            ids = self._ids[:]
+        for i in range(0, len(ids), limit):
+            yield ids[i:i + limit]
+
+    def describe_index_stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._refresh_if_changed()
+            return {"dimension": self.dimension, "total_vector_count": len(self._ids)}
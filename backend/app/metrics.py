@@ -0,0 +1,113 @@
+import time
+import logging
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from prometheus_client import REGISTRY, Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+logger = logging.getLogger("app.timing")
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_seconds",
+    "Duration of pipeline stages",
+    ["pipeline", "stage"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+STAGE_ERRORS = Counter(
+    "rag_stage_errors_total",
+    "Pipeline stages that raised",
+    ["pipeline", "stage"],
+)
+ANSWERS = Counter(
+    "rag_answers_total",
+    "Answered questions by outcome",
+    ["outcome"],
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route", "status"],
+)
+INGEST_ITEMS = Counter(
+    "rag_ingest_items_total",
+    "Items processed by the ingest pipeline",
+    ["kind"],
+)
+
+
+@contextmanager
+def span(stage: str, pipeline: str = "answer") -> Iterator[None]:
+    """
+    Time a pipeline stage: observed in rag_stage_seconds{pipeline, stage}
+    and logged at DEBUG (with the request trace id when logging is set up).
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(pipeline, stage).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(pipeline, stage).observe(elapsed)
+        logger.debug("%s.%s took %.1f ms", pipeline, stage, elapsed * 1000)
+
+
+def stage_summary(pipeline: str) -> List[Tuple[str, int, float]]:
+    """
+    (stage, count, total seconds) for every stage of a pipeline observed in this process.
+    """
+    totals: Dict[str, List[float]] = {}
+    for metric in STAGE_SECONDS.collect():
+        for sample in metric.samples:
+            if sample.labels.get("pipeline") != pipeline:
+                continue
+            entry = totals.setdefault(sample.labels["stage"], [0, 0.0])
+            if sample.name.endswith("_count"):
+                entry[0] = int(sample.value)
+            elif sample.name.endswith("_sum"):
+                entry[1] = sample.value
+    return [(stage, count, seconds) for stage, (count, seconds) in totals.items()]
+
+
+class StatsCollector:
+    """
+    Exports the in-process counters of caches and batching helpers at scrape
+    time. Each source returns a `stats()` dict, or None when not created yet.
+    """
+
+    def __init__(self):
+        self._caches: Dict[str, Callable[[], dict]] = {}
+        self._sources: Dict[str, Callable[[], dict]] = {}
+
+    def add_cache(self, name: str, stats_fn: Callable[[], dict]) -> None:
+        self._caches[name] = stats_fn
+
+    def add_source(self, name: str, stats_fn: Callable[[], dict]) -> None:
+        self._sources[name] = stats_fn
+
+    def collect(self):
+        hits = CounterMetricFamily("rag_cache_hits", "Cache hits", labels=["cache"])
+        misses = CounterMetricFamily("rag_cache_misses", "Cache misses", labels=["cache"])
+        ratio = GaugeMetricFamily("rag_cache_hit_ratio", "Cache hit ratio since start", labels=["cache"])
+        size = GaugeMetricFamily("rag_cache_entries", "Entries currently cached", labels=["cache"])
+        for name, stats_fn in self._caches.items():
+            stats = stats_fn()
+            if not stats:
+                continue
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            ratio.add_metric([name], stats["hit_ratio"])
+            size.add_metric([name], stats["size"])
+        yield from (hits, misses, ratio, size)
+
+        for name, stats_fn in self._sources.items():
+            stats = stats_fn()
+            for key, value in (stats or {}).items():
+                if isinstance(value, (int, float)):
+                    yield GaugeMetricFamily(f"rag_{name}_{key}", f"{name} {key.replace('_', ' ')}", value=value)
+
+
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
@@ -0,0 +1,117 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+import numpy as np
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    source_ids: List[str]
+    score: float
+    contexts: List[str] = field(default_factory=list)
+
+
+class SemanticCache:
+    """
+    Answer cache keyed by query embedding rather than query text.
+
+    A lookup returns the stored answer of the most similar cached query when
+    its cosine similarity is at least `threshold`. Entries live in a fixed
+    (maxsize x dim) matrix; when full, the least recently used entry is replaced.
+    `version_fn` returns the current index version; whenever it changes
+    (i.e. the index was re-ingested) the whole cache is dropped. Entries
+    also expire `ttl` seconds after they were stored (None: never), which
+    bounds staleness where the version change is not visible to this process.
+    """
+
+    def __init__(self, dimension: int, maxsize: int = 512, threshold: float = 0.95,
+                 version_fn: Optional[Callable[[], object]] = None, ttl: Optional[float] = None):
+        self.dimension = dimension
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._version_fn = version_fn
+        self._version = version_fn() if version_fn else None
+        self._lock = threading.Lock()
+        self._vectors = np.zeros((maxsize, dimension), dtype=np.float32)
+        self._last_used = np.zeros(maxsize, dtype=np.float64)
+        self._expires_at = np.full(maxsize, np.inf)
+        self._entries: List[Optional[CachedAnswer]] = [None] * maxsize
+        self._size = 0
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_version(self) -> None:
+        if self._version_fn is None:
+            return
+        version = self._version_fn()
+        if version != self._version:
+            self._clear()
+            self._version = version
+
+    def _clear(self) -> None:
+        self._entries = [None] * self.maxsize
+        self._last_used[:] = 0
+        self._size = 0
+
+    def lookup(self, vector) -> Optional[CachedAnswer]:
+        if self.maxsize <= 0:
+            return None
+        query = self._normalize(vector)
+        with self._lock:
+            self._check_version()
+            if self._size:
+                scores = self._vectors[:self._size] @ query
+                scores[self._expires_at[:self._size] <= time.monotonic()] = -np.inf
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    self._last_used[best] = time.monotonic()
+                    self.hits += 1
+                    entry = self._entries[best]
+                    return CachedAnswer(entry.answer, entry.source_ids, float(scores[best]), entry.contexts)
+            self.misses += 1
+            return None
+
+    def store(self, vector, answer: str, source_ids: List[str], contexts: Optional[List[str]] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        query = self._normalize(vector)
+        with self._lock:
+            self._check_version()
+            if self._size < self.maxsize:
+                slot = self._size
+                self._size += 1
+            else:
+                # Expired entries go first, then the least recently used one
+                expired = np.flatnonzero(self._expires_at <= time.monotonic())
+                slot = int(expired[0]) if expired.size else int(np.argmin(self._last_used))
+            now = time.monotonic()
+            self._vectors[slot] = query
+            self._last_used[slot] = now
+            self._expires_at[slot] = now + self.ttl if self.ttl is not None else np.inf
+            self._entries[slot] = CachedAnswer(answer, list(source_ids), 1.0, list(contexts or []))
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._clear()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
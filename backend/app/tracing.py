@@ -0,0 +1,28 @@
+import logging
+import uuid
+from contextvars import ContextVar
+from typing import Optional
+
+TRACE_HEADER = "X-Request-ID"
+
+# Trace id of the request being handled; copied into tasks spawned while handling it
+trace_id_var: ContextVar[str] = ContextVar("trace_id", default="-")
+
+
+def new_trace_id(incoming: Optional[str] = None) -> str:
+    """
+    Use the caller's request id when it looks sane, otherwise mint one.
+    """
+    if incoming and len(incoming) <= 64 and incoming.isprintable():
+        return incoming
+    return uuid.uuid4().hex
+
+
+class TraceIdFilter(logging.Filter):
+    """
+    Adds `trace_id` to every log record so formats can include %(trace_id)s.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = trace_id_var.get()
+        return True
@@ -2,11 +2,19 @@ import re
 import html
 import json
 import unicodedata
+from functools import lru_cache
 from bs4 import BeautifulSoup
-from typing import List, Union
+from typing import List, Optional, Union
 
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+# Content types of scraped pages. The spider stores already-extracted text;
+# pages without a content type (older feeds) are treated as HTML.
+CONTENT_TYPE_HTML = "text/html"
+CONTENT_TYPE_TEXT = "text/plain"
+
+_SECTION_BREAK_RE = re.compile(r"\n\s*\n")
+
 
 def extract_content_from_json(data: str) -> str:
     """
@@ -42,10 +50,53 @@ def clean_html(raw_html: str) -> str:
     return text.strip()
 
 
+def clean_text(text: str) -> str:
+    """
+    Normalize already-extracted page text (no HTML parsing). Sections
+    (separated by blank lines) are cleaned separately and kept apart by a
+    blank line, so chunks split on section boundaries first.
+    """
+    sections = (remove_noise(normalize_unicode(section)) for section in _SECTION_BREAK_RE.split(text))
+    return "\n\n".join(section for section in sections if section)
+
+
+# ---------- Precompiled normalization patterns ---------- #
+
+_EMOJI_RE = re.compile("["
+    u"\U0001F600-\U0001F64F"
+    u"\U0001F300-\U0001F5FF"
+    u"\U0001F680-\U0001F6FF"
+    u"\U0001F1E0-\U0001F1FF"
+    u"\u2600-\u26FF"
+    u"\u2700-\u27BF"
+    "]+", flags=re.UNICODE)
+_URL_RE = re.compile(r"\bhttps?:\/\/\S+\b")
+# Equivalent to the former '"?url"?:\s*"?https?:.*?"?(,)?': the lazy '.*?' never consumes anything
+_URL_KEY_RE = re.compile(r'"?url"?:\s*"?https?:"?,?', flags=re.IGNORECASE)
+_SYMBOL_RE = re.compile(r"[^\w\s.,!?;:'\"()/-]")
+# Punctuation runs collapse to their last character, dash runs to a single dash
+_REPEAT_RE = re.compile(r"[.,!?;:]{2,}|-{2,}")
+_WHITESPACE_RE = re.compile(r"\s+")
+_SPACE_BEFORE_PUNCT_RE = re.compile(r" ([.,!?;:])")
+_PUNCT_GLUED_RE = re.compile(r"([.,!?;:])([^ ])")
+
+# ASCII fast path for _SYMBOL_RE: one str.translate instead of a per-character regex
+_ASCII_SYMBOL_TABLE = {
+    code: " " for code in range(128) if _SYMBOL_RE.match(chr(code))
+}
+
+
+def _last_char(match: "re.Match") -> str:
+    return match.group()[-1]
+
+
 def normalize_unicode(text: str) -> str:
     """
     Convert accented/unicode text to closest ASCII version.
     """
+    if text.isascii():
+        # NFKD leaves ASCII untouched; skip both full-size copies
+        return text
     text = unicodedata.normalize("NFKD", text)
     return text.encode("ascii", "ignore").decode("utf-8", "ignore")
 
@@ -54,50 +105,76 @@ def remove_noise(text: str) -> str:
     """
     Clean up noisy punctuation, symbols, and extra tokens like 'url:'.
     """
-    # Remove emojis and pictographs
-    emoji_pattern = re.compile("[" 
-        u"\U0001F600-\U0001F64F"
-        u"\U0001F300-\U0001F5FF"
-        u"\U0001F680-\U0001F6FF"
-        u"\U0001F1E0-\U0001F1FF"
-        u"\u2600-\u26FF"
-        u"\u2700-\u27BF"
-        "]+", flags=re.UNICODE)
-    text = emoji_pattern.sub(" ", text)
-
-    text = re.sub(r"\bhttps?:\/\/\S+\b", " ", text)
-    text = re.sub(r'"?url"?:\s*"?https?:.*?"?(,)?', " ", text, flags=re.IGNORECASE)
-
-    text = re.sub(r"[^\w\s.,!?;:'\"()/-]", " ", text)
-    text = re.sub(r"([.,!?;:]){2,}", r"\1", text)
-    text = re.sub(r"[-]{2,}", "-", text)
+    is_ascii = text.isascii()
+
+    # Remove emojis and pictographs (none can occur in ASCII text)
+    if not is_ascii:
+        text = _EMOJI_RE.sub(" ", text)
+
+    # Substring checks are far cheaper than a regex scan that finds nothing
+    # _URL_RE is case-sensitive, _URL_KEY_RE is not ("URL: HTTPS:")
+    if "http" in text:
+        text = _URL_RE.sub(" ", text)
+    if not is_ascii:
+        text = _URL_KEY_RE.sub(" ", text)
+    else:
+        lowered = text.lower()
+        if "http" in lowered and "url" in lowered:
+            text = _URL_KEY_RE.sub(" ", text)
+
+    if is_ascii:
+        text = text.translate(_ASCII_SYMBOL_TABLE)
+    else:
+        text = _SYMBOL_RE.sub(" ", text)
+    text = _REPEAT_RE.sub(_last_char, text)
+
+    # Collapsing whitespace first is safe: no later pass creates or depends
+    # on whitespace runs, and it lets the punctuation passes match a single space
+    text = _WHITESPACE_RE.sub(" ", text)
+    text = _SPACE_BEFORE_PUNCT_RE.sub(r"\1", text)
+    text = _PUNCT_GLUED_RE.sub(r"\1 \2", text)
 
-    text = re.sub(r"\s+([.,!?;:])", r"\1", text)
-    text = re.sub(r"([.,!?;:])([^\s])", r"\1 \2", text)
+    return text.strip()
 
-    text = re.sub(r"\s+", " ", text)
 
-    return text.strip()
+@lru_cache(maxsize=8)
+def _get_splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=["\n\n", "\n", ".", "!", "?", " ", ""],
+    )
 
 
 def split_into_chunks(text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> List[str]:
     """
     Split long cleaned text into overlapping chunks.
     """
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        separators=["\n\n", "\n", ".", "!", "?", " ", ""],
-    )
-    return splitter.split_text(text)
+    return _get_splitter(chunk_size, chunk_overlap).split_text(text)
 
 
-def clean_and_chunk(raw_input: Union[str, dict, list], chunk_size: int = 1000, chunk_overlap: int = 200) -> List[str]:
+def clean_and_chunk(raw_input: Union[str, dict, list], chunk_size: int = 1000, chunk_overlap: int = 200,
+                    content_type: str = CONTENT_TYPE_HTML) -> List[str]:
     """
     Clean raw HTML or JSON string and return cleaned text chunks.
-    Supports HTML pages or {"url": ..., "content": ...} JSONs.
+    Supports HTML pages or {"url": ..., "content": ...} JSONs, and
+    already-extracted text with content_type="text/plain".
     """
-    content_only = extract_content_from_json(raw_input)
-    cleaned = clean_html(content_only)
+    if content_type == CONTENT_TYPE_TEXT:
+        cleaned = clean_text(raw_input)
+    else:
+        content_only = extract_content_from_json(raw_input)
+        cleaned = clean_html(content_only)
     chunks = split_into_chunks(cleaned, chunk_size, chunk_overlap)
     return chunks
+
+
+def clean_and_chunk_many(raw_inputs: List[str], chunk_size: int = 1000, chunk_overlap: int = 200,
+                         content_types: Optional[List[str]] = None) -> List[List[str]]:
+    """
+    Clean and chunk several pages in one call; the unit of work sent to
+    ingest worker processes (amortizes inter-process overhead).
+    """
+    content_types = content_types or [CONTENT_TYPE_HTML] * len(raw_inputs)
+    return [clean_and_chunk(raw, chunk_size, chunk_overlap, content_type)
+            for raw, content_type in zip(raw_inputs, content_types)]
@@ -0,0 +1,155 @@
+import re
+import hashlib
+from collections import defaultdict
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+_WORD_RE = re.compile(r"\w+")
+# Digit-bearing words that are dates or times, not identifiers
+_TIME_OR_ORDINAL_RE = re.compile(r"\d{1,2}(am|pm)|\d+(st|nd|rd|th)")
+_YEAR_RE = re.compile(r"(19|20)\d\d")
+_MONTHS = {
+    "jan", "january", "feb", "february", "mar", "march", "apr", "april", "may", "jun", "june",
+    "jul", "july", "aug", "august", "sep", "sept", "september", "oct", "october", "nov", "november",
+    "dec", "december",
+}
+# Words whose number identifies a place even when lowercase ("gate 3")
+_LOCATION_NOUNS = {"terminal", "gate", "level", "belt", "counter", "row", "zone", "basement", "unit", "exit", "door"}
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def _lsh_params(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    Pick (bands, rows) with bands * rows <= num_perm whose S-curve midpoint
+    (1 / bands) ** (1 / rows) is closest to the threshold.
+    """
+    best = (num_perm, 1)
+    best_error = float("inf")
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class NearDuplicateDetector:
+    """
+    MinHash-LSH detector for near-duplicate text chunks (repeated nav menus,
+    banners and footers that differ slightly between pages).
+
+    Texts are shingled into word n-grams; two chunks whose estimated Jaccard
+    similarity reaches `threshold` are near-duplicates, unless they differ in
+    an identifier (see `key_tokens`): "Terminal 1" and "Terminal 2" chunks
+    are kept apart however much text they share, since such identifiers are
+    what keyword search looks for. Dates, times, names and other wording
+    may differ. The first chunk seen
+    represents its cluster; later members map to the representative's key.
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = _lsh_params(num_perm, threshold)
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+        self._buckets: List[Dict[bytes, List[int]]] = [defaultdict(list) for _ in range(self.bands)]
+        self._signatures: List[np.ndarray] = []
+        self._key_tokens: List[FrozenSet[str]] = []
+        self._keys: List[str] = []
+        self.clusters: Dict[str, List[str]] = {}
+
+    def _shingle_hashes(self, text: str) -> np.ndarray:
+        words = _WORD_RE.findall(text.lower())
+        n = self.shingle_size
+        shingles = {" ".join(words[i:i + n]) for i in range(max(len(words) - n + 1, 1))}
+        return np.array(
+            [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles],
+            dtype=np.uint64,
+        )
+
+    @staticmethod
+    def key_tokens(text: str) -> FrozenSet[str]:
+        """
+        Identifiers in the text: codes mixing letters and digits ("T4",
+        "B12") and numbers named by the word before them ("Terminal 2",
+        "gate 3"). Years, days of the month, times and ordinals are not
+        identifiers. Lowercased for comparison.
+        """
+        words = _WORD_RE.findall(text)
+        tokens = set()
+        for i, word in enumerate(words):
+            lowered = word.lower()
+            if word.isdigit():
+                previous = words[i - 1] if i else ""
+                if (previous and not _YEAR_RE.fullmatch(word)
+                        and (previous[0].isupper() or previous.lower() in _LOCATION_NOUNS)
+                        and previous.lower() not in _MONTHS):
+                    tokens.add(f"{previous.lower()} {word}")
+            elif any(char.isdigit() for char in word) and not _TIME_OR_ORDINAL_RE.fullmatch(lowered):
+                tokens.add(lowered)
+        return frozenset(tokens)
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = self._shingle_hashes(text)
+        # Universal hashing (a * x + b) mod p, one permutation per column
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def find(self, text: str, key: str, label: Optional[str] = None) -> Optional[str]:
+        """
+        Return the representative key if `text` near-duplicates an earlier
+        chunk; otherwise index it as a new representative and return None.
+        Removed members are recorded in `clusters` under `label` (default: key).
+        """
+        signature = self.signature(text)
+        band_keys = [
+            signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+        candidates = set()
+        for buckets, band_key in zip(self._buckets, band_keys):
+            candidates.update(buckets.get(band_key, ()))
+        key_tokens = self.key_tokens(text)
+        for candidate in sorted(candidates):
+            if np.mean(self._signatures[candidate] == signature) < self.threshold:
+                continue
+            if key_tokens != self._key_tokens[candidate]:
+                continue  # differs in an identifier: distinct content
+            representative = self._keys[candidate]
+            if representative != key:  # exact copies share an id already
+                self.clusters.setdefault(representative, []).append(label or key)
+            return representative
+
+        position = len(self._keys)
+        self._signatures.append(signature)
+        self._key_tokens.append(key_tokens)
+        self._keys.append(key)
+        for buckets, band_key in zip(self._buckets, band_keys):
+            buckets[band_key].append(position)
+        return None
+
+    @property
+    def removed(self) -> int:
+        return sum(len(members) for members in self.clusters.values())
+
+    def report(self, limit: int = 5) -> None:
+        """
+        Print a summary of removed clusters, largest first.
+        """
+        if not self.clusters:
+            print("[Dedup] No near-duplicate chunks found.")
+            return
+        print(f"[Dedup] Removed {self.removed} near-duplicate chunks in {len(self.clusters)} clusters "
+              f"(threshold {self.threshold}).")
+        largest = sorted(self.clusters.items(), key=lambda item: len(item[1]), reverse=True)[:limit]
+        for representative, members in largest:
+            examples = ", ".join(sorted(set(members))[:3])
+            print(f"[Dedup]   {representative[:12]}: {len(members)} copies, e.g. {examples}")
@@ -0,0 +1,38 @@
+import threading
+from functools import wraps
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+_UNSET = object()
+
+
+def once(factory: Callable[[], T]) -> Callable[[], T]:
+    """
+    Decorator for zero-argument factories of shared clients: the object is
+    built on first call (thread-safe, exactly once) and reused afterwards.
+    `initialized()` reports whether it was built; `reset()` drops it.
+    """
+    value = _UNSET
+    lock = threading.Lock()
+
+    @wraps(factory)
+    def get() -> T:
+        nonlocal value
+        if value is _UNSET:
+            with lock:
+                if value is _UNSET:
+                    value = factory()
+        return value
+
+    def initialized() -> bool:
+        return value is not _UNSET
+
+    def reset() -> None:
+        nonlocal value
+        with lock:
+            value = _UNSET
+
+    get.initialized = initialized
+    get.reset = reset
+    return get
@@ -0,0 +1,64 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one execution.
+
+    The first caller starts the work as a task; callers arriving while it
+    runs await the same task and receive its result or exception. A caller
+    that is cancelled only stops waiting (the task is shielded); the task
+    itself is cancelled once no caller is left waiting on it.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[Hashable, int] = {}
+        self.executions = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None or _finishing(task):
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            self._waiters[key] = 0
+            self.executions += 1
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.shared += 1
+
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._calls.get(key) is task and self._waiters[key] == 1:
+                # Last waiter gone: nobody needs the result. Forget the key now,
+                # so a caller arriving before the task unwinds starts a new call
+                del self._calls[key]
+                del self._waiters[key]
+                task.cancel()
+            raise
+        finally:
+            if self._calls.get(key) is task:
+                self._waiters[key] -= 1
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+            del self._waiters[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved even if every waiter left
+
+    def stats(self) -> Dict[str, int]:
+        return {"executions": self.executions, "shared": self.shared, "in_flight": len(self._calls)}
+
+
+def _finishing(task: asyncio.Task) -> bool:
+    """
+    A task that can no longer produce a result for a new caller: done, or
+    being cancelled (Task.cancelling() exists from Python 3.11).
+    """
+    cancelling = getattr(task, "cancelling", None)
+    return task.done() or (cancelling is not None and cancelling() > 0)
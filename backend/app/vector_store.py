@@ -1,19 +1,135 @@
-from typing import List
-import hashlib
-from pinecone import Pinecone, ServerlessSpec
-from app.embeddings import embed_texts, get_gemini_embedding
+from typing import TYPE_CHECKING, Dict, List, Optional
+import asyncio
+import os
+import time
+from app.embeddings import embed_texts, get_gemini_embedding, EmbeddingError
 from app.config import config
-from langchain.schema import Document
+from app.local_index import LocalVectorIndex
+from app.embedding_cache import content_hash
+from app.id_manifest import KnownIds
+from app.bm25 import BM25Index, BM25Store, reciprocal_rank_fusion
+from app.metrics import span, INGEST_ITEMS
+from app.utils.lazy import once
+
+if TYPE_CHECKING:
+    from langchain.schema import Document
 
 
-pc = Pinecone(api_key=config.PINECONE_API_KEY)
 EMBEDDING_DIM = 768
 
+_pc = None
+_pinecone_index = None
+_pinecone_async_index = None
+_local_index: Optional[LocalVectorIndex] = None
+
+
+def get_pinecone_client():
+    """
+    Lazily construct the Pinecone client, so the local backend runs without it.
+    """
+    global _pc
+    if _pc is None:
+        from pinecone import Pinecone
+        _pc = Pinecone(api_key=config.PINECONE_API_KEY)
+    return _pc
+
+
+def get_index():
+    """
+    Return the configured vector index (Pinecone or local).
+    Both expose the same fetch / upsert / query operations.
+    """
+    global _local_index, _pinecone_index
+    if config.VECTOR_BACKEND == "local":
+        if _local_index is None:
+            _local_index = LocalVectorIndex(config.LOCAL_INDEX_DIR, EMBEDDING_DIM)
+        return _local_index
+    if _pinecone_index is None:
+        if config.PINECONE_HOST:
+            _pinecone_index = get_pinecone_client().Index(host=config.PINECONE_HOST)
+        else:
+            _pinecone_index = get_pinecone_client().Index(config.PINECONE_INDEX)
+    return _pinecone_index
+
+
+def get_async_pinecone_index():
+    """
+    Return a shared asyncio Pinecone index handle.
+    It keeps one pooled HTTP session for all in-flight queries.
+    """
+    global _pinecone_async_index
+    if _pinecone_async_index is None:
+        pc = get_pinecone_client()
+        host = config.PINECONE_HOST or pc.describe_index(config.PINECONE_INDEX).host
+        _pinecone_async_index = pc.IndexAsyncio(host=host)
+    return _pinecone_async_index
+
+
+async def aclose_async_index() -> None:
+    """
+    Close the shared asyncio Pinecone index and its HTTP session, if open.
+    """
+    global _pinecone_async_index
+    if _pinecone_async_index is not None:
+        index, _pinecone_async_index = _pinecone_async_index, None
+        await index.close()
+
+
+def index_key() -> str:
+    """
+    Identity of the target index; local id/ingest manifests only apply to the index they were built for.
+    """
+    if config.VECTOR_BACKEND == "local":
+        return f"local:{os.path.abspath(config.LOCAL_INDEX_DIR)}"
+    return f"pinecone:{config.PINECONE_INDEX}"
+
+
+@once
+def _load_known_ids() -> KnownIds:
+    return KnownIds(config.KNOWN_IDS_PATH, index_key())
+
+
+@once
+def get_known_ids() -> KnownIds:
+    """
+    Local set of chunk ids already stored in the index.
+    Built from the index on first use when no saved copy exists for it
+    (once, even when the first calls come from several upsert threads).
+    """
+    known_ids = _load_known_ids()
+    if not known_ids.loaded:
+        _reconcile(known_ids)
+    return known_ids
+
+
+def reconcile_known_ids() -> None:
+    """
+    Rebuild the local id set by listing the ids actually in the index.
+    """
+    _reconcile(_load_known_ids())
+
+
+def _reconcile(known_ids: KnownIds) -> None:
+    try:
+        known_ids.reconcile(get_index().list())
+        print(f"[VectorStore] Reconciled known ids with the index: {len(known_ids)} ids.")
+    except Exception as e:
+        # e.g. pod-based Pinecone indexes cannot list ids; upserts stay idempotent
+        print(f"[VectorStore] Could not list index ids ({e}). Starting from the local set.")
+
 
 def init_pinecone_index() -> None:
     """
-    Ensure the Pinecone index exists. If not, create it.
+    Ensure the vector index exists. If not, create it.
     """
+    if config.VECTOR_BACKEND == "local":
+        stats = get_index().describe_index_stats()
+        print(f"[LocalIndex] Using '{config.LOCAL_INDEX_DIR}' ({stats['total_vector_count']} vectors).")
+        return
+
+    from pinecone import ServerlessSpec
+
+    pc = get_pinecone_client()
     existing_indexes = [index.name for index in pc.list_indexes()]
     if config.PINECONE_INDEX not in existing_indexes:
         print(f"[Pinecone] Creating index: {config.PINECONE_INDEX}")
@@ -27,30 +143,51 @@ def init_pinecone_index() -> None:
         print(f"[Pinecone] Index '{config.PINECONE_INDEX}' already exists.")
 
 
+def get_index_version() -> Optional[int]:
+    """
+    Version stamp of the indexed corpus, bumped by every ingest run.
+    Readers (e.g. the answer cache) compare it to detect re-ingestion.
+    """
+    try:
+        return os.stat(config.INDEX_VERSION_PATH).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def bump_index_version() -> None:
+    """
+    Mark the indexed corpus as changed.
+    """
+    directory = os.path.dirname(config.INDEX_VERSION_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(config.INDEX_VERSION_PATH, "w", encoding="utf-8") as f:
+        f.write(str(time.time_ns()))
+
+
 def generate_id(text: str) -> str:
     """
     Create a deterministic hash ID from chunk text.
     """
-    return hashlib.md5(text.encode("utf-8")).hexdigest()
+    return content_hash(text)
 
 
-def store_documents_in_pinecone(docs: List[Document], batch_size: int = 32) -> None:
+def store_documents_in_pinecone(docs: List["Document"], batch_size: int = 32) -> None:
     """
-    Embed and upsert unique Document chunks into Pinecone.
+    Embed and upsert unique Document chunks into the vector index.
     Skips chunks already uploaded using deterministic hashing.
     """
-    index = pc.Index(config.PINECONE_INDEX)
+    index = get_index()
 
     texts = [doc.page_content for doc in docs]
     metadatas = [doc.metadata for doc in docs]
     ids = [generate_id(text) for text in texts]
 
-    # Query existing IDs to avoid duplicates
-    existing_ids = set()
-    for i in range(0, len(ids), batch_size):
-        batch_ids = ids[i:i+batch_size]
-        results = index.fetch(ids=batch_ids)
-        existing_ids.update(results.vectors.keys())
+    # Skip ids already in the index (local lookup, no remote fetch)
+    with span("known_id_lookup", "ingest"):
+        known_ids = get_known_ids()
+        existing_ids = {id_ for id_, known in zip(ids, known_ids.contains_many(ids)) if known}
+    INGEST_ITEMS.labels("chunks_skipped").inc(len(existing_ids))
 
     print(f"[Pinecone] Found {len(existing_ids)} duplicate chunks. Skipping them...")
 
@@ -70,38 +207,182 @@ def store_documents_in_pinecone(docs: List[Document], batch_size: int = 32) -> N
     new_ids = [id_ for (id_, _, _) in filtered]
     new_metadatas = [meta for (_, _, meta) in filtered]
 
-    embeddings = embed_texts(new_texts)
+    embedding_error = None
+    try:
+        with span("embed", "ingest"):
+            embeddings = embed_texts(new_texts)
+    except EmbeddingError as e:
+        # Store what succeeded, then report the failure so the batch is retried
+        embeddings = e.results
+        embedding_error = e
 
     # Upsert in batches
     to_upsert = [
         (id_, vector, {"text": text, **(meta or {})})
         for id_, vector, text, meta in zip(new_ids, embeddings, new_texts, new_metadatas)
+        if vector is not None
     ]
 
     for i in range(0, len(to_upsert), batch_size):
         batch = to_upsert[i:i+batch_size]
-        index.upsert(vectors=batch)
+        with span("upsert", "ingest"):
+            index.upsert(vectors=batch)
+        known_ids.add_many(id_ for id_, _, _ in batch)
+    INGEST_ITEMS.labels("chunks_upserted").inc(len(to_upsert))
 
     print(f"[Pinecone] ✅ Upserted {len(to_upsert)} new document chunks.")
 
+    if embedding_error is not None:
+        raise embedding_error
 
-def retrieve_relevant_docs(query: str, top_k: int = 5) -> List[str]:
+
+def delete_documents(ids: List[str], batch_size: int = 1000) -> None:
     """
-    Perform similarity search and return relevant document texts.
+    Delete chunks from the vector index by id.
     """
-    query_vector = get_gemini_embedding(query).tolist()
-    pinecone_index = pc.Index(config.PINECONE_INDEX)
+    if not ids:
+        return
+    index = get_index()
+    with span("delete", "ingest"):
+        for i in range(0, len(ids), batch_size):
+            index.delete(ids=ids[i:i + batch_size])
+    get_known_ids().discard_many(ids)
+    INGEST_ITEMS.labels("chunks_deleted").inc(len(ids))
+    print(f"[VectorStore] 🗑 Deleted {len(ids)} stale document chunks.")
+
+
+def search_index(query_vector: List[float], top_k: int = 5, include_values: bool = False) -> List[Dict]:
+    """
+    Similarity search for an already-embedded query.
+    Returns matches as {"id", "score", "text"} dicts (plus "values" if requested).
+    """
+    index = get_index()
 
-    results = pinecone_index.query(
-        vector=query_vector,
+    results = index.query(
+        vector=list(query_vector),
         top_k=top_k,
-        include_metadata=True
+        include_metadata=True,
+        include_values=include_values
     )
+    return _matches_to_docs(results)
+
+
+async def asearch_index(query_vector: List[float], top_k: int = 5, include_values: bool = False) -> List[Dict]:
+    """
+    Async variant of search_index that never blocks the event loop.
+    """
+    if config.VECTOR_BACKEND == "local":
+        # In-process NumPy search; run off-loop (it releases the GIL)
+        return await asyncio.to_thread(search_index, query_vector, top_k, include_values)
 
+    results = await get_async_pinecone_index().query(
+        vector=list(query_vector),
+        top_k=top_k,
+        include_metadata=True,
+        include_values=include_values
+    )
+    return _matches_to_docs(results)
+
+
+def _matches_to_docs(results) -> List[Dict]:
     matches = results.get("matches", [])
 
-    return [
-        match["metadata"]["text"]
-        for match in matches
-        if "metadata" in match and "text" in match["metadata"]
-    ]
+    docs = []
+    for match in matches:
+        if "metadata" not in match or "text" not in match["metadata"]:
+            continue
+        doc = {"id": match["id"], "score": match["score"], "text": match["metadata"]["text"]}
+        if match.get("values"):
+            doc["values"] = list(match["values"])
+        docs.append(doc)
+    return docs
+
+
+def get_bm25_index() -> Optional[BM25Index]:
+    """
+    Keyword index written by the ingest pipeline; reloaded when it changes.
+    None when disabled or not built yet (search falls back to dense only).
+    """
+    if not config.BM25_INDEX_PATH:
+        return None
+    return _get_bm25_store().get()
+
+
+@once
+def _get_bm25_store() -> BM25Store:
+    return BM25Store(config.BM25_INDEX_PATH, index_key())
+
+
+def hybrid_search(query: str, query_vector: List[float], top_k: int = 5, include_values: bool = False) -> List[Dict]:
+    """
+    Dense + BM25 retrieval fused with reciprocal rank fusion.
+    Exact tokens (terminal codes, gate numbers, shop names) are caught by
+    BM25 even when the embedding ranks them low, so a small top_k suffices.
+    With include_values, every match carries its vector (keyword-only
+    matches are fetched from the index).
+    """
+    bm25 = get_bm25_index()
+    if bm25 is None:
+        return search_index(query_vector, top_k=top_k, include_values=include_values)
+
+    dense = search_index(query_vector, top_k=max(top_k, config.HYBRID_CANDIDATES), include_values=include_values)
+    fused = _fuse(dense, bm25.search(query, config.HYBRID_CANDIDATES), bm25, top_k)
+    if include_values:
+        missing = [match["id"] for match in fused if "values" not in match]
+        if missing:
+            _attach_values(fused, get_index().fetch(ids=missing))
+    return fused
+
+
+async def ahybrid_search(query: str, query_vector: List[float], top_k: int = 5, include_values: bool = False) -> List[Dict]:
+    """
+    Async variant of hybrid_search; the BM25 lookup runs alongside the dense query.
+    """
+    bm25 = await asyncio.to_thread(get_bm25_index)
+    if bm25 is None:
+        return await asearch_index(query_vector, top_k=top_k, include_values=include_values)
+
+    dense, keyword = await asyncio.gather(
+        asearch_index(query_vector, top_k=max(top_k, config.HYBRID_CANDIDATES), include_values=include_values),
+        asyncio.to_thread(bm25.search, query, config.HYBRID_CANDIDATES),
+    )
+    fused = _fuse(dense, keyword, bm25, top_k)
+    if include_values:
+        missing = [match["id"] for match in fused if "values" not in match]
+        if missing:
+            if config.VECTOR_BACKEND == "local":
+                fetched = await asyncio.to_thread(get_index().fetch, ids=missing)
+            else:
+                fetched = await get_async_pinecone_index().fetch(ids=missing)
+            _attach_values(fused, fetched)
+    return fused
+
+
+def _fuse(dense: List[Dict], keyword, bm25: BM25Index, top_k: int) -> List[Dict]:
+    by_id = {match["id"]: match for match in dense}
+    fused = reciprocal_rank_fusion(
+        [[match["id"] for match in dense], [doc_id for doc_id, _ in keyword]],
+        k=config.RRF_K,
+    )
+    docs = []
+    for doc_id, score in fused[:top_k]:
+        doc = {"id": doc_id, "score": score, "text": bm25.texts.get(doc_id, "")}
+        if doc_id in by_id:
+            doc.update({key: value for key, value in by_id[doc_id].items() if key != "score"})
+        docs.append(doc)
+    return docs
+
+
+def _attach_values(matches: List[Dict], fetched) -> None:
+    vectors = fetched.vectors
+    for match in matches:
+        if "values" not in match and match["id"] in vectors:
+            match["values"] = list(vectors[match["id"]].values)
+
+
+def retrieve_relevant_docs(query: str, top_k: int = 5) -> List[str]:
+    """
+    Perform hybrid (dense + BM25) search and return relevant document texts.
+    """
+    query_vector = get_gemini_embedding(query).tolist()
+    return [match["text"] for match in hybrid_search(query, query_vector, top_k=top_k)]
@@ -0,0 +1,125 @@
+"""
+Micro-benchmark for the text normalization in app/utils/cleaner.py.
+
+Runs the current normalizer and a frozen copy of the previous
+implementation over real scraped pages, checks both produce identical
+output, and reports throughput in MB/s.
+
+Usage (from backend/):
+    python -m benchmarks.bench_cleaner [scrapers/data/scraped_pages.json] [--repeat 5]
+"""
+import argparse
+import html
+import json
+import re
+import time
+import unicodedata
+from typing import Callable, List
+
+from app.utils import cleaner
+
+
+# ---------- Previous implementation (baseline) ---------- #
+
+def legacy_normalize_unicode(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text)
+    return text.encode("ascii", "ignore").decode("utf-8", "ignore")
+
+
+def legacy_remove_noise(text: str) -> str:
+    emoji_pattern = re.compile("["
+        u"\U0001F600-\U0001F64F"
+        u"\U0001F300-\U0001F5FF"
+        u"\U0001F680-\U0001F6FF"
+        u"\U0001F1E0-\U0001F1FF"
+        u"\u2600-\u26FF"
+        u"\u2700-\u27BF"
+        "]+", flags=re.UNICODE)
+    text = emoji_pattern.sub(" ", text)
+
+    text = re.sub(r"\bhttps?:\/\/\S+\b", " ", text)
+    text = re.sub(r'"?url"?:\s*"?https?:.*?"?(,)?', " ", text, flags=re.IGNORECASE)
+
+    text = re.sub(r"[^\w\s.,!?;:'\"()/-]", " ", text)
+    text = re.sub(r"([.,!?;:]){2,}", r"\1", text)
+    text = re.sub(r"[-]{2,}", "-", text)
+
+    text = re.sub(r"\s+([.,!?;:])", r"\1", text)
+    text = re.sub(r"([.,!?;:])([^\s])", r"\1 \2", text)
+
+    text = re.sub(r"\s+", " ", text)
+
+    return text.strip()
+
+
+def legacy_normalize(text: str) -> str:
+    return legacy_remove_noise(legacy_normalize_unicode(html.unescape(text))).strip()
+
+
+def current_normalize(text: str) -> str:
+    return cleaner.remove_noise(cleaner.normalize_unicode(html.unescape(text))).strip()
+
+
+# Edge cases checked on every run besides the scraped pages
+EQUIVALENCE_CASES = [
+    'url: HTTPS://x',
+    'URL: HTTP:',
+    '"Url": "Https://www.changiairport.com/en.html", next',
+    'see https://example.com/a?b=c -- now!!',
+    'Café … naïve 😀 url:http:',
+]
+
+
+# ---------- Harness ---------- #
+
+def load_pages(path: str) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".jl")):
+            pages = [json.loads(line) for line in f if line.strip()]
+        else:
+            pages = json.load(f)
+    return [page.get("content", "") for page in pages]
+
+
+def throughput(fn: Callable[[str], str], texts: List[str], repeat: int) -> float:
+    """
+    Best-of-`repeat` throughput in MB/s of UTF-8 input.
+    """
+    size_mb = sum(len(t.encode("utf-8")) for t in texts) / 1e6
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            fn(text)
+        best = min(best, time.perf_counter() - start)
+    return size_mb / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default="scrapers/data/scraped_pages.json")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    texts = load_pages(args.path)
+    size_mb = sum(len(t.encode("utf-8")) for t in texts) / 1e6
+    print(f"[Bench] {len(texts)} pages, {size_mb:.2f} MB from {args.path}")
+
+    mismatches = sum(legacy_normalize(t) != current_normalize(t) for t in texts + EQUIVALENCE_CASES)
+    if mismatches:
+        raise SystemExit(f"[Bench] ❌ Output differs from the previous normalizer on {mismatches} pages")
+    print("[Bench] ✅ Output identical to the previous normalizer")
+
+    before = throughput(legacy_normalize, texts, args.repeat)
+    after = throughput(current_normalize, texts, args.repeat)
+    print(f"[Bench] normalize  before: {before:8.2f} MB/s   after: {after:8.2f} MB/s   ({after / before:.2f}x)")
+
+    full = throughput(cleaner.clean_html, texts, args.repeat)
+    print(f"[Bench] clean_html (BeautifulSoup + normalize): {full:8.2f} MB/s")
+
+    text = throughput(cleaner.clean_text, texts, args.repeat)
+    print(f"[Bench] clean_text (extracted text, no parsing): {text:8.2f} MB/s   ({text / full:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""
+Local stand-ins for the Gemini embedding, Pinecone data-plane and Groq chat
+endpoints, for load tests without network access or API keys.
+
+A single HTTP/1.1 server answers all three APIs with the wire format the
+official clients expect:
+    POST /v1beta/models/<model>:embedContent        (Gemini, REST transport)
+    POST /v1beta/models/<model>:batchEmbedContents
+    POST /query, GET /vectors/fetch                  (Pinecone index host)
+    POST /openai/v1/chat/completions                 (Groq, JSON or SSE stream)
+
+Embeddings are deterministic per text, so the fake index returns stable
+neighbours. Each service gets its own injected latency (plus jitter) and
+the error rate applies to every call (HTTP 503). The LLM streams its
+answer token by token with a per-token delay.
+
+Usage (from backend/), to point a dev server at it by hand:
+    python -m benchmarks.fake_providers [--port 8900] [--error-rate 0.01]
+then set GEMINI_API_ENDPOINT, GEMINI_TRANSPORT=rest, PINECONE_HOST and
+GROQ_API_BASE to the printed URL.
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+DIMENSION = 768
+
+_TOPICS = [
+    "Jewel Changi Airport", "the Rain Vortex", "Terminal 1", "Terminal 2", "Terminal 3",
+    "Terminal 4", "the Butterfly Garden", "the Canopy Park", "free Singapore tours",
+    "transit hotels", "baggage storage", "the Skytrain", "taxi stands", "the MRT station",
+    "duty-free shopping", "lounges", "prayer rooms", "nursing rooms", "lost and found",
+    "early check-in", "the Changi Rewards programme", "car parks", "wheelchair assistance",
+    "the Shiseido Forest Valley", "the Hedge Maze", "currency exchange", "free Wi-Fi",
+]
+_FACTS = [
+    "is open 24 hours a day", "is located in the public area", "can be reached by the Skytrain",
+    "is free for all visitors", "requires a valid boarding pass", "is near the arrival hall",
+    "offers services in several languages", "can be booked online in advance",
+    "is accessible for wheelchair users", "closes for maintenance once a month",
+]
+
+
+def embed_text(text: str, dimension: int = DIMENSION) -> List[float]:
+    """
+    Deterministic unit vector for a text (same text, same vector).
+    """
+    seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+    vector = np.random.default_rng(seed).standard_normal(dimension)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def make_corpus(size: int) -> List[str]:
+    """
+    Synthetic airport passages for the fake index.
+    """
+    rng = random.Random(0)
+    passages = []
+    for i in range(size):
+        topic = _TOPICS[i % len(_TOPICS)]
+        facts = rng.sample(_FACTS, 3)
+        passages.append(
+            f"{topic.capitalize()} {facts[0]}. Visitors often ask about {topic}; it {facts[1]} "
+            f"and {facts[2]}. Reference passage {i}."
+        )
+    return passages
+
+
+def make_queries(count: int) -> List[str]:
+    """
+    Distinct user questions (the semantic answer cache never matches two of them).
+    """
+    templates = ["Where is {}?", "What are the opening hours of {}?", "How do I get to {}?",
+                 "Is {} free?", "Tell me about {}."]
+    return [
+        f"{templates[i % len(templates)].format(_TOPICS[(i // len(templates)) % len(_TOPICS)])} (#{i})"
+        for i in range(count)
+    ]
+
+
+class FakeProviders:
+    """
+    The fake provider server. Latencies are in milliseconds per call; for the
+    LLM, `llm_latency_ms` is the time to first token and `token_delay_ms` the
+    gap between streamed tokens. `counts()` reports calls per endpoint.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, embed_latency_ms: float = 30,
+                 query_latency_ms: float = 20, llm_latency_ms: float = 300, token_delay_ms: float = 10,
+                 answer_tokens: int = 60, jitter: float = 0.2, error_rate: float = 0.0,
+                 corpus_size: int = 500, seed: Optional[int] = None):
+        self.latency = {"embed": embed_latency_ms, "query": query_latency_ms, "llm": llm_latency_ms}
+        self.token_delay_ms = token_delay_ms
+        self.answer_tokens = answer_tokens
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.corpus = make_corpus(corpus_size)
+        self.ids = [f"fake-{i}" for i in range(corpus_size)]
+        self.matrix = np.array([embed_text(text) for text in self.corpus], dtype=np.float32)
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()  # also guards the call counters
+        self._counts: Counter = Counter()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeProviders":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-providers", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def counts(self) -> Dict[str, int]:
+        with self._rng_lock:
+            return dict(self._counts)
+
+    def env(self) -> Dict[str, str]:
+        """
+        Backend settings that route every provider call to this server.
+        """
+        return {
+            "GEMINI_API_KEY": "fake",
+            "GEMINI_API_ENDPOINT": self.url,
+            "GEMINI_TRANSPORT": "rest",
+            "GROQ_API_KEY": "fake",
+            "GROQ_API_BASE": self.url,
+            "VECTOR_BACKEND": "pinecone",
+            "PINECONE_API_KEY": "fake",
+            "PINECONE_ENVIRONMENT": "fake",
+            "PINECONE_INDEX": "fake",
+            "PINECONE_HOST": self.url,
+        }
+
+    # ---------- Fault injection ---------- #
+
+    def _sleep(self, ms: float) -> None:
+        if ms <= 0:
+            return
+        with self._rng_lock:
+            factor = 1 + self._rng.uniform(-self.jitter, self.jitter)
+        time.sleep(ms * factor / 1000)
+
+    def _count(self, name: str) -> None:
+        with self._rng_lock:
+            self._counts[name] += 1
+
+    def _should_fail(self) -> bool:
+        with self._rng_lock:
+            return self._rng.random() < self.error_rate
+
+    # ---------- Responses ---------- #
+
+    def _query(self, body: dict) -> dict:
+        vector = np.asarray(body["vector"], dtype=np.float32)
+        scores = self.matrix @ (vector / (np.linalg.norm(vector) or 1.0))
+        top_k = min(int(body.get("topK", 10)), len(self.ids))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        matches = []
+        for i in best[np.argsort(-scores[best])]:
+            match = {"id": self.ids[i], "score": float(scores[i])}
+            if body.get("includeValues"):
+                match["values"] = self.matrix[i].tolist()
+            if body.get("includeMetadata"):
+                match["metadata"] = {"text": self.corpus[i]}
+            matches.append(match)
+        return {"matches": matches, "namespace": body.get("namespace", "")}
+
+    def _fetch(self, ids: List[str]) -> dict:
+        vectors = {}
+        for vector_id in ids:
+            if vector_id.startswith("fake-") and vector_id[5:].isdigit() and int(vector_id[5:]) < len(self.ids):
+                vectors[vector_id] = {"id": vector_id, "values": self.matrix[int(vector_id[5:])].tolist()}
+        return {"vectors": vectors, "namespace": ""}
+
+    def _answer_tokens(self) -> List[str]:
+        words = " ".join(self.corpus[:3]).split()
+        return [word + " " for word in (words * (self.answer_tokens // len(words) + 1))[:self.answer_tokens]]
+
+    def _completion(self, body: dict, content: str) -> dict:
+        tokens = len(content.split())
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                         "finish_reason": "stop", "logprobs": None}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": tokens, "total_tokens": tokens},
+        }
+
+    def _chunk(self, body: dict, completion_id: str, delta: dict, finish_reason: Optional[str] = None) -> dict:
+        return {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason, "logprobs": None}],
+        }
+
+    # ---------- HTTP handler ---------- #
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, as with the real providers
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, payload: dict, status: int = 200) -> None:
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _write_chunk(self, data: bytes) -> None:
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            def _begin(self, service: str, endpoint: str) -> bool:
+                fake._count(endpoint)
+                fake._sleep(fake.latency[service])
+                if fake._should_fail():
+                    fake._count("injected_errors")
+                    self._json({"error": {"code": 503, "message": "Injected failure", "status": "UNAVAILABLE"}}, 503)
+                    return False
+                return True
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path != "/vectors/fetch":
+                    return self._json({"error": {"message": f"Unknown path {url.path}"}}, 404)
+                if self._begin("query", "pinecone_fetch"):
+                    self._json(fake._fetch(parse_qs(url.query).get("ids", [])))
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                path = urlparse(self.path).path
+                if path.endswith(":batchEmbedContents"):
+                    if self._begin("embed", "gemini_batch_embed"):
+                        texts = [" ".join(p.get("text", "") for p in r["content"]["parts"]) for r in body["requests"]]
+                        self._json({"embeddings": [{"values": embed_text(text)} for text in texts]})
+                elif path.endswith(":embedContent"):
+                    if self._begin("embed", "gemini_embed"):
+                        text = " ".join(p.get("text", "") for p in body["content"]["parts"])
+                        self._json({"embedding": {"values": embed_text(text)}})
+                elif path == "/query":
+                    if self._begin("query", "pinecone_query"):
+                        self._json(fake._query(body))
+                elif path.endswith("/chat/completions"):
+                    self._chat(body)
+                else:
+                    self._json({"error": {"message": f"Unknown path {path}"}}, 404)
+
+            def _chat(self, body: dict) -> None:
+                streaming = bool(body.get("stream"))
+                if not self._begin("llm", "groq_stream" if streaming else "groq_completion"):
+                    return
+                tokens = fake._answer_tokens()[:body.get("max_tokens") or None]
+                if not streaming:
+                    for _ in tokens[1:]:
+                        fake._sleep(fake.token_delay_ms)
+                    return self._json(fake._completion(body, "".join(tokens).strip()))
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+                events = [fake._chunk(body, completion_id, {"role": "assistant", "content": ""})]
+                events += [fake._chunk(body, completion_id, {"content": token}) for token in tokens]
+                events.append(fake._chunk(body, completion_id, {}, finish_reason="stop"))
+                for i, event in enumerate(events):
+                    if 1 < i < len(events) - 1:
+                        fake._sleep(fake.token_delay_ms)
+                    self._write_chunk(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                self._write_chunk(b"data: [DONE]\n\n")
+                self._write_chunk(b"")
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--embed-latency-ms", type=float, default=30)
+    parser.add_argument("--query-latency-ms", type=float, default=20)
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--token-delay-ms", type=float, default=10)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    fake = FakeProviders(
+        host=args.host, port=args.port, embed_latency_ms=args.embed_latency_ms,
+        query_latency_ms=args.query_latency_ms, llm_latency_ms=args.llm_latency_ms,
+        token_delay_ms=args.token_delay_ms, error_rate=args.error_rate,
+    ).start()
+    print(f"[Fake] Providers listening on {fake.url}")
+    for key, value in fake.env().items():
+        print(f"{key}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(f"[Fake] Calls: {fake.counts()}")
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
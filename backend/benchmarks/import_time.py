@@ -0,0 +1,78 @@
+"""
+Import-time budget check for the backend modules.
+
+Imports each module in a fresh interpreter under `python -X importtime`
+with no credentials in the environment (imports must not need them),
+reports the cumulative import time, and exits non-zero if a module
+exceeds the budget. tests/test_import_time.py enforces the same budgets.
+
+Usage (from backend/):
+    python -m benchmarks.import_time [--budget-ms N] [--repeat 3] [module ...]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import List, Optional
+
+# Budgets in ms; modules serving HTTP also pay for FastAPI / pydantic themselves
+DEFAULT_BUDGETS = {
+    "app.config": 50,
+    "app.embeddings": 300,
+    "app.vector_store": 300,
+    "app.chatbot": 300,
+    "app.api": 900,
+    "main": 1000,
+}
+
+_LINE_RE = re.compile(r"^import time:\s+\d+ \|\s+(\d+) \|\s*(\S+)$")
+
+
+def measure(module: str, cwd: Optional[str] = None) -> int:
+    """
+    Cumulative import time of `module` in microseconds (fresh interpreter
+    started in `cwd`, default: the current directory).
+    """
+    cwd = cwd or os.getcwd()
+    env = {key: os.environ[key] for key in ("PATH", "HOME", "SYSTEMROOT") if key in os.environ}
+    env["PYTHONPATH"] = cwd
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env, cwd=cwd,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    for line in result.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match and match.group(2) == module:
+            return int(match.group(1))
+    raise RuntimeError(f"No import time reported for {module}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=list(DEFAULT_BUDGETS))
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="budget for every module (default: per-module budgets, 300 ms otherwise)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    over: List[str] = []
+    for module in args.modules:
+        budget_ms = args.budget_ms if args.budget_ms is not None else DEFAULT_BUDGETS.get(module, 300)
+        # Best of N runs: filters out disk-cache and scheduler noise
+        best_ms = min(measure(module) for _ in range(args.repeat)) / 1000
+        status = "ok" if best_ms <= budget_ms else "OVER BUDGET"
+        print(f"{module:<24} {best_ms:8.1f} ms / {budget_ms:.0f} ms  {status}")
+        if best_ms > budget_ms:
+            over.append(module)
+
+    if over:
+        print(f"{len(over)} module(s) exceed their import budget: {', '.join(over)}")
+        sys.exit(1)
+    print("All modules within their import budget.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+"""
+Offline load test of the answer API.
+
+Starts the fake providers (benchmarks/fake_providers.py), launches the
+backend under uvicorn pointed at them, waits for /ready and drives
+/api/ask (or /api/ask/stream with --stream) at a fixed concurrency.
+Reports throughput, client-side latency percentiles, time to first token
+when streaming, and a per-stage breakdown from the server's Prometheus
+histograms (scraped before and after the run). No network access or API
+keys are needed.
+
+The result is written as JSON (--output); --max-p95-ms / --max-error-rate
+make the run exit non-zero when exceeded, for use as a CI gate.
+
+Usage (from backend/):
+    python -m benchmarks.load_test [--requests 500] [--concurrency 32] [--stream]
+        [--llm-latency-ms 300] [--error-rate 0.01] [--env QUERY_BATCH_SIZE=1]
+        [--output load_test.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+from prometheus_client.parser import text_string_to_metric_families
+
+from app.chatbot import ERROR_ANSWER
+from benchmarks.fake_providers import FakeProviders, make_queries
+
+
+# ---------- Backend process ---------- #
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_backend(fake: FakeProviders, port: int, data_dir: str, overrides: Dict[str, str],
+                  log_path: str) -> subprocess.Popen:
+    """
+    Launch uvicorn with every provider routed to the fakes and all local
+    state (caches, manifests, version stamp) inside `data_dir`.
+    """
+    env = {key: os.environ[key] for key in ("PATH", "HOME", "SYSTEMROOT") if key in os.environ}
+    env.update(fake.env())
+    env.update({
+        "PYTHONPATH": os.getcwd(),
+        "BM25_INDEX_PATH": "",
+        "EMBED_CACHE_PATH": "",
+        "INDEX_VERSION_PATH": os.path.join(data_dir, "index_version"),
+        "INGEST_MANIFEST_PATH": os.path.join(data_dir, "ingest_manifest.json"),
+        "KNOWN_IDS_PATH": os.path.join(data_dir, "known_ids.npz"),
+        "LOCAL_INDEX_DIR": os.path.join(data_dir, "local_index"),
+    })
+    env.update(overrides)
+    with open(log_path, "w") as log:
+        return subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+             "--log-level", "warning", "--no-access-log"],
+            cwd=os.getcwd(), env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+
+
+async def wait_ready(client: httpx.AsyncClient, process: subprocess.Popen, timeout: float) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Backend exited with code {process.returncode}")
+        try:
+            response = await client.get("/ready")
+            if response.status_code == 200:
+                return response.json()
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"Backend not ready after {timeout:.0f}s")
+
+
+# ---------- Prometheus scrape ---------- #
+
+Histograms = Dict[Tuple[str, Tuple[Tuple[str, str], ...]], dict]
+
+
+async def scrape(client: httpx.AsyncClient) -> Tuple[Histograms, Dict[str, float]]:
+    """
+    Histograms as {(name, labels): {"count", "sum", "buckets": {le: n}}} and
+    rag_answers_total by outcome.
+    """
+    response = await client.get("/metrics")
+    response.raise_for_status()
+    histograms: Histograms = {}
+    answers: Dict[str, float] = {}
+    for family in text_string_to_metric_families(response.text):
+        for sample in family.samples:
+            if family.type == "histogram":
+                labels = {k: v for k, v in sample.labels.items() if k != "le"}
+                entry = histograms.setdefault(
+                    (family.name, tuple(sorted(labels.items()))), {"count": 0.0, "sum": 0.0, "buckets": {}}
+                )
+                if sample.name.endswith("_bucket"):
+                    entry["buckets"][float(sample.labels["le"])] = sample.value
+                elif sample.name.endswith("_count"):
+                    entry["count"] = sample.value
+                elif sample.name.endswith("_sum"):
+                    entry["sum"] = sample.value
+            elif sample.name == "rag_answers_total":
+                answers[sample.labels["outcome"]] = sample.value
+    return histograms, answers
+
+
+def histogram_quantile(buckets: Dict[float, float], q: float) -> Optional[float]:
+    """
+    Quantile estimate from cumulative bucket counts, interpolating linearly
+    inside the bucket (as Prometheus' histogram_quantile does).
+    """
+    bounds = sorted(buckets)
+    if not bounds or buckets[bounds[-1]] <= 0:
+        return None
+    rank = q * buckets[bounds[-1]]
+    lower, below = 0.0, 0.0
+    for bound in bounds:
+        count = buckets[bound]
+        if count >= rank:
+            if bound == float("inf"):
+                return lower
+            return lower + (bound - lower) * ((rank - below) / ((count - below) or 1))
+        lower, below = bound, count
+    return lower
+
+
+def histogram_delta(before: Histograms, after: Histograms, name: str) -> Dict[tuple, dict]:
+    """
+    Per-label-set summary (count, mean, p50/p95/p99 in ms) of what a histogram recorded between two scrapes.
+    """
+    summary = {}
+    for (metric, labels), entry in after.items():
+        if metric != name:
+            continue
+        previous = before.get((metric, labels), {"count": 0.0, "sum": 0.0, "buckets": {}})
+        count = entry["count"] - previous["count"]
+        if count <= 0:
+            continue
+        buckets = {le: n - previous["buckets"].get(le, 0.0) for le, n in entry["buckets"].items()}
+        quantiles = {f"p{int(q * 100)}_ms": histogram_quantile(buckets, q) for q in (0.5, 0.95, 0.99)}
+        summary[labels] = {
+            "count": int(count),
+            "mean_ms": round((entry["sum"] - previous["sum"]) / count * 1000, 2),
+            **{key: round(value * 1000, 2) for key, value in quantiles.items() if value is not None},
+        }
+    return summary
+
+
+# ---------- Load generation ---------- #
+
+async def run_load(client: httpx.AsyncClient, queries: List[str], concurrency: int, stream: bool) -> List[dict]:
+    """
+    Send every query once with at most `concurrency` requests in flight.
+    """
+    pending = iter(queries)
+    results: List[dict] = []
+
+    async def ask(query: str) -> dict:
+        start = time.perf_counter()
+        record = {"ok": False, "error_answer": False, "ttft": None}
+        try:
+            if stream:
+                tokens = []
+                async with client.stream("POST", "/api/ask/stream", json={"query": query}) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if line.startswith("data: ") and line != "data: {}":
+                            if record["ttft"] is None:
+                                record["ttft"] = time.perf_counter() - start
+                            tokens.append(json.loads(line[6:]).get("token", ""))
+                answer = "".join(tokens)
+            else:
+                response = await client.post("/api/ask", json={"query": query})
+                response.raise_for_status()
+                answer = response.json()["answer"]
+            record["ok"] = True
+            record["error_answer"] = answer.strip() == ERROR_ANSWER
+        except (httpx.HTTPError, ValueError, KeyError) as e:
+            record["exception"] = f"{type(e).__name__}: {e}"
+        record["latency"] = time.perf_counter() - start
+        return record
+
+    async def worker():
+        for query in pending:
+            results.append(await ask(query))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results
+
+
+def build_queries(count: int, repeat_ratio: float, seed: int) -> List[str]:
+    """
+    `count` questions, a `repeat_ratio` share of them repeats of earlier ones
+    (exercising the answer cache and request coalescing).
+    """
+    rng = random.Random(seed)
+    distinct = iter(make_queries(count))
+    queries: List[str] = []
+    for _ in range(count):
+        if queries and rng.random() < repeat_ratio:
+            queries.append(rng.choice(queries))
+        else:
+            queries.append(next(distinct))
+    return queries
+
+
+def percentiles_ms(values: List[float]) -> dict:
+    if not values:
+        return {}
+    array = np.array(values) * 1000
+    return {
+        "mean": round(float(array.mean()), 2),
+        "p50": round(float(np.percentile(array, 50)), 2),
+        "p95": round(float(np.percentile(array, 95)), 2),
+        "p99": round(float(np.percentile(array, 99)), 2),
+        "max": round(float(array.max()), 2),
+    }
+
+
+# ---------- Entry point ---------- #
+
+async def run(args) -> dict:
+    overrides = dict(item.split("=", 1) for item in args.env)
+    fake = FakeProviders(
+        embed_latency_ms=args.embed_latency_ms, query_latency_ms=args.query_latency_ms,
+        llm_latency_ms=args.llm_latency_ms, token_delay_ms=args.token_delay_ms,
+        answer_tokens=args.answer_tokens, jitter=args.jitter, error_rate=args.error_rate, seed=args.seed,
+    ).start()
+    port = _free_port()
+
+    with tempfile.TemporaryDirectory(prefix="load_test_") as data_dir:
+        log_path = args.server_log or os.path.join(data_dir, "server.log")
+        process = start_backend(fake, port, data_dir, overrides, log_path)
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits,
+                                         timeout=args.timeout) as client:
+                ready = await wait_ready(client, process, args.startup_timeout)
+                print(f"[Load] Backend ready on port {port} (warm-up: {ready['warm_up']})")
+                calls_before = fake.counts()
+                histograms_before, answers_before = await scrape(client)
+
+                queries = build_queries(args.requests, args.repeat_ratio, args.seed)
+                print(f"[Load] {len(queries)} requests, concurrency {args.concurrency}, "
+                      f"{'streaming' if args.stream else 'non-streaming'}")
+                start = time.perf_counter()
+                results = await run_load(client, queries, args.concurrency, args.stream)
+                duration = time.perf_counter() - start
+
+                histograms_after, answers_after = await scrape(client)
+        except RuntimeError:
+            with open(log_path) as log:
+                print(log.read()[-3000:], file=sys.stderr)
+            raise
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            fake.stop()
+
+    calls_after = fake.counts()
+    failed = [r for r in results if not r["ok"]]
+    error_answers = sum(r["error_answer"] for r in results)
+    stages = {
+        dict(labels)["stage"]: summary
+        for labels, summary in histogram_delta(histograms_before, histograms_after, "rag_stage_seconds").items()
+        if dict(labels).get("pipeline") == "answer"
+    }
+    server = {
+        f"{dict(labels)['method']} {dict(labels)['route']} {dict(labels)['status']}": summary
+        for labels, summary in histogram_delta(histograms_before, histograms_after, "http_request_duration_seconds").items()
+        if dict(labels)["route"].startswith("/api/")
+    }
+    return {
+        "settings": {
+            "requests": args.requests, "concurrency": args.concurrency, "stream": args.stream,
+            "repeat_ratio": args.repeat_ratio, "embed_latency_ms": args.embed_latency_ms,
+            "query_latency_ms": args.query_latency_ms, "llm_latency_ms": args.llm_latency_ms,
+            "token_delay_ms": args.token_delay_ms, "answer_tokens": args.answer_tokens,
+            "jitter": args.jitter, "error_rate": args.error_rate, "env": overrides,
+        },
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(results) / duration, 2) if duration else None,
+        "failed_requests": len(failed),
+        "error_answers": error_answers,
+        "error_rate": round((len(failed) + error_answers) / len(results), 4) if results else 0.0,
+        "failures": sorted({r["exception"] for r in failed})[:10],
+        "latency_ms": percentiles_ms([r["latency"] for r in results if r["ok"]]),
+        "ttft_ms": percentiles_ms([r["ttft"] for r in results if r["ttft"] is not None]),
+        "stages": stages,
+        "server_latency": server,
+        "answers": {k: int(v - answers_before.get(k, 0)) for k, v in answers_after.items()
+                    if v - answers_before.get(k, 0) > 0},
+        "provider_calls": {k: v - calls_before.get(k, 0) for k, v in calls_after.items()
+                           if v - calls_before.get(k, 0) > 0},
+    }
+
+
+def print_report(result: dict) -> None:
+    latency = result["latency_ms"]
+    print(f"[Load] {result['throughput_rps']} req/s over {result['duration_s']} s, "
+          f"{result['failed_requests']} failed, {result['error_answers']} error answers")
+    if latency:
+        print(f"[Load] Latency ms: p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}  max {latency['max']}")
+    if result["ttft_ms"]:
+        ttft = result["ttft_ms"]
+        print(f"[Load] Time to first token ms: p50 {ttft['p50']}  p95 {ttft['p95']}  p99 {ttft['p99']}")
+    print(f"{'stage':<22} {'count':>7} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for stage, summary in sorted(result["stages"].items(), key=lambda item: -item[1]["mean_ms"]):
+        print(f"{stage:<22} {summary['count']:>7} {summary['mean_ms']:>9.1f} {summary.get('p50_ms', 0):>9.1f} "
+              f"{summary.get('p95_ms', 0):>9.1f} {summary.get('p99_ms', 0):>9.1f}")
+    print(f"[Load] Answers: {result['answers']}  Provider calls: {result['provider_calls']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--stream", action="store_true", help="use /api/ask/stream and measure time to first token")
+    parser.add_argument("--repeat-ratio", type=float, default=0.0, help="share of requests repeating an earlier question")
+    parser.add_argument("--embed-latency-ms", type=float, default=30)
+    parser.add_argument("--query-latency-ms", type=float, default=20)
+    parser.add_argument("--llm-latency-ms", type=float, default=300, help="fake LLM time to first token")
+    parser.add_argument("--token-delay-ms", type=float, default=10)
+    parser.add_argument("--answer-tokens", type=int, default=60)
+    parser.add_argument("--jitter", type=float, default=0.2, help="relative +/- jitter on injected latencies")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of provider calls failing with 503")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra backend setting, e.g. QUERY_BATCH_SIZE=1 (repeatable)")
+    parser.add_argument("--timeout", type=float, default=120, help="per-request timeout in seconds")
+    parser.add_argument("--startup-timeout", type=float, default=60)
+    parser.add_argument("--server-log", default=None, help="keep the backend log at this path")
+    parser.add_argument("--output", default="load_test.json", help="result file (JSON)")
+    parser.add_argument("--max-p95-ms", type=float, default=None, help="fail if p95 latency exceeds this")
+    parser.add_argument("--max-error-rate", type=float, default=None,
+                        help="fail if the share of failed requests and error answers exceeds this")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+    print_report(result)
+    print(f"[Load] Result written to {args.output}")
+
+    over = []
+    if args.max_p95_ms is not None and result["latency_ms"].get("p95", float("inf")) > args.max_p95_ms:
+        over.append(f"p95 {result['latency_ms'].get('p95')} ms > {args.max_p95_ms} ms")
+    if args.max_error_rate is not None and result["error_rate"] > args.max_error_rate:
+        over.append(f"error rate {result['error_rate']} > {args.max_error_rate}")
+    if over:
+        print(f"[Load] Budget exceeded: {'; '.join(over)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
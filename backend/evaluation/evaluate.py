@@ -1,94 +1,97 @@
-import sys, os, asyncio, threading, nest_asyncio
+"""
+Evaluation of the RAG pipeline over the CSV dataset.
+
+Two modes:
+    answers    (default) Opik experiment: every row is answered once by
+               answer_with_context (the contexts come from the same
+               retrieval) and scored for hallucination and answer relevance
+               by a Gemini judge. Rows run in parallel on --threads workers.
+    retrieval  Offline retrieval quality: embeds each query, runs the hybrid
+               search and context selection of the app against the
+               local index (--backend pinecone for the hosted one) and reports
+               recall@k, MRR and latency. No LLM, Opik or judge calls; query
+               embeddings are cached on disk so reruns need no API calls.
+
+Retrieval mode needs relevance labels: a `Relevant_Sources` column with the
+page URL(s) that answer the question, separated by ";". Chunks are mapped to
+their page through the ingest manifest. Unlabelled rows only count towards
+latency; a dataset without any labels is an error unless --latency-only is
+given. Retrieval mode needs no GROQ_API_KEY, and GEMINI_API_KEY only when a
+query embedding is not cached yet.
+
+Usage (from backend/):
+    python -m evaluation.evaluate [--threads 4]
+    python -m evaluation.evaluate --mode retrieval [--k 1 3 5 10] [--output retrieval_eval.json] [--latency-only]
+"""
+import sys, os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Set
+
+import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
-import groq
-import opik
-from opik import Opik, track
-from opik.evaluation import evaluate
-from opik.evaluation.metrics import Hallucination, AnswerRelevance
-from opik.evaluation.models import LiteLLMChatModel
-
-from app.chatbot import answer_user_query, retrieve_relevant_docs
-
-# Allow nested event loops
-nest_asyncio.apply()
-
-# Patch threads to have loops
-_original = threading.Thread.__init__
-def patched_init(self, *a, **k):
-    _original(self, *a, **k)
-    _orig_run = self.run
-    def run_wrapped():
-        try:
-            asyncio.get_event_loop()
-        except RuntimeError:
-            asyncio.set_event_loop(asyncio.new_event_loop())
-        _orig_run()
-    self.run = run_wrapped
-threading.Thread.__init__ = patched_init
-
-# Load environment
-load_dotenv()
-OPIK_API_KEY = os.getenv("OPIK_API_KEY")
-OPIK_WORKSPACE = os.getenv("OPIK_WORKSPACE_ID")
-OPIK_PROJECT_NAME = os.getenv("OPIK_PROJECT_NAME")
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-
-
-if not all([OPIK_API_KEY, OPIK_WORKSPACE, OPIK_PROJECT_NAME, GROQ_API_KEY, GEMINI_API_KEY]):
-    raise ValueError("Missing credentials in .env - Ensure OPIK_API_KEY, OPIK_WORKSPACE, OPIK_PROJECT_NAME, GROQ_API_KEY, and GEMINI_API_KEY (or GOOGLE_API_KEY) are set.")
-
-# Configure Opik
-opik.configure(api_key=OPIK_API_KEY, workspace=OPIK_WORKSPACE)
-
-# Groq client for your RAG generation (remains unchanged)
-groq_client = groq.Groq(api_key=GROQ_API_KEY)
-
-@track
-def traced_retrieve_relevant_docs(query: str):
-    return retrieve_relevant_docs(query)
-
-@track
-def traced_answer_user_query(user_query: str):
-    return answer_user_query(user_query)
-
-@track
-def rag_pipeline(query: str):
-    ctx = traced_retrieve_relevant_docs(query)
-    ans = traced_answer_user_query(query)
-    return ans, ctx
-
-def evaluation_task(dataset_item: dict) -> dict:
-    ans, ctx = rag_pipeline(dataset_item["Query"])
-    return {
-        "input": dataset_item["Query"],
-        "output": ans,
-        "context": ctx
-    }
 
-# Load dataset
 DATASET_PATH = "evaluation/Changi_Airport_Dataset - Sheet1.csv"
-df = pd.read_csv(DATASET_PATH)
-client = Opik()
-dataset = client.get_or_create_dataset(
-    name="Production RAG Evaluation Dataset",
-    description="Dataset for evaluating RAG pipeline performance with Groq",
-)
-dataset.insert_from_pandas(df)
+LABEL_COLUMN = "Relevant_Sources"
+QUERY_EMBED_CACHE_PATH = os.path.join("data", "eval_query_embeddings.sqlite3")
 
 
-gemini_eval_model = LiteLLMChatModel(model_name="gemini/gemini-1.5-flash-latest")
+# ---------- Answer quality (Opik) ---------- #
 
-scoring_metrics = [
-    Hallucination(model=gemini_eval_model),
-    AnswerRelevance(model=gemini_eval_model),
-]
+def run_answer_evaluation(df: pd.DataFrame, threads: int) -> None:
+    import opik
+    from opik import Opik, track
+    from opik.evaluation import evaluate
+    from opik.evaluation.metrics import Hallucination, AnswerRelevance
+    from opik.evaluation.models import LiteLLMChatModel
+
+    from app.chatbot import answer_with_context
+
+    OPIK_API_KEY = os.getenv("OPIK_API_KEY")
+    OPIK_WORKSPACE = os.getenv("OPIK_WORKSPACE_ID")
+    OPIK_PROJECT_NAME = os.getenv("OPIK_PROJECT_NAME")
+    GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+
+    if not all([OPIK_API_KEY, OPIK_WORKSPACE, OPIK_PROJECT_NAME, GROQ_API_KEY, GEMINI_API_KEY]):
+        raise ValueError("Missing credentials in .env - Ensure OPIK_API_KEY, OPIK_WORKSPACE, OPIK_PROJECT_NAME, GROQ_API_KEY, and GEMINI_API_KEY (or GOOGLE_API_KEY) are set.")
+
+    # Configure Opik
+    opik.configure(api_key=OPIK_API_KEY, workspace=OPIK_WORKSPACE)
+
+    @track
+    def rag_pipeline(query: str):
+        # One retrieval per row: the answer comes back with the contexts it used
+        result = answer_with_context(query)
+        return result.answer, result.contexts
+
+    def evaluation_task(dataset_item: dict) -> dict:
+        ans, ctx = rag_pipeline(dataset_item["Query"])
+        return {
+            "input": dataset_item["Query"],
+            "output": ans,
+            "context": ctx
+        }
+
+    client = Opik()
+    dataset = client.get_or_create_dataset(
+        name="Production RAG Evaluation Dataset",
+        description="Dataset for evaluating RAG pipeline performance with Groq",
+    )
+    dataset.insert_from_pandas(df)
+
+    gemini_eval_model = LiteLLMChatModel(model_name="gemini/gemini-1.5-flash-latest")
+
+    scoring_metrics = [
+        Hallucination(model=gemini_eval_model),
+        AnswerRelevance(model=gemini_eval_model),
+    ]
 
-if __name__ == "__main__":
     evaluate(
         dataset=dataset,
         task=evaluation_task,
@@ -96,10 +99,195 @@ if __name__ == "__main__":
         project_name=OPIK_PROJECT_NAME,
         experiment_config={
             "retriever_version": "v1.0",
-            "generator_model": "groq/llama3-8b-8192", 
+            "generator_model": "groq/llama3-8b-8192",
             "evaluation_purpose": "Production RAG pipeline evaluation",
-            "evaluation_llm": "gemini/gemini-1.5-flash-latest" 
+            "evaluation_llm": "gemini/gemini-1.5-flash-latest"
         },
         verbose=1,
-        task_threads=1
+        task_threads=threads
     )
+
+
+# ---------- Retrieval quality (offline) ---------- #
+
+def parse_sources(value) -> Set[str]:
+    if not isinstance(value, str):
+        return set()
+    return {source.strip().rstrip("/") for source in value.split(";") if source.strip()}
+
+
+def chunk_sources() -> Dict[str, Set[str]]:
+    """
+    chunk id -> page URLs containing it, from the ingest manifest.
+    """
+    from app.config import config
+    from app.embed_store import load_manifest
+
+    sources: Dict[str, Set[str]] = {}
+    for url, entry in load_manifest(config.INGEST_MANIFEST_PATH).items():
+        for chunk_id in entry.get("chunk_ids", []):
+            sources.setdefault(chunk_id, set()).add(url.rstrip("/"))
+    return sources
+
+
+def embed_queries(queries: List[str], cache_path: Optional[str]) -> List[np.ndarray]:
+    """
+    Query embeddings, served from an on-disk cache when possible so that
+    repeated evaluation runs make no embedding calls.
+    """
+    from app.embeddings import get_query_model, get_embedding_model_name
+    from app.embedding_cache import EmbeddingCache, content_hash
+
+    cache = EmbeddingCache(cache_path, f"{get_embedding_model_name()}:retrieval_query") if cache_path else None
+    hashes = [content_hash(query) for query in queries]
+    cached = cache.get_many(hashes) if cache is not None else {}
+    missing = [i for i, h in enumerate(hashes) if h not in cached]
+    print(f"[Eval] {len(queries) - len(missing)} / {len(queries)} query embeddings served from cache")
+    if missing:
+        from app.config import config, ConfigError
+        if not config.GEMINI_API_KEY:
+            raise ConfigError(f"GEMINI_API_KEY is required to embed {len(missing)} uncached queries")
+        fresh = get_query_model().embed_documents([queries[i] for i in missing], task_type="retrieval_query")
+        cached.update({hashes[i]: vector for i, vector in zip(missing, fresh)})
+        if cache is not None:
+            cache.put_many((hashes[i], vector) for i, vector in zip(missing, fresh))
+    return [np.asarray(cached[h]) for h in hashes]
+
+
+def score_ranking(ranked_sources: Sequence[Set[str]], relevant: Set[str], ks: Sequence[int]) -> dict:
+    """
+    Source-level recall@k and reciprocal rank of one ranked chunk list.
+    """
+    scores = {}
+    for k in ks:
+        found = set().union(*ranked_sources[:k]) & relevant
+        scores[f"recall@{k}"] = len(found) / len(relevant)
+    scores["rr"] = next(
+        (1 / rank for rank, sources in enumerate(ranked_sources, start=1) if sources & relevant), 0.0
+    )
+    return scores
+
+
+def run_retrieval_evaluation(df: pd.DataFrame, ks: List[int], workers: int,
+                             cache_path: Optional[str]) -> dict:
+    from app.config import config
+    from app.vector_store import hybrid_search, get_index, get_bm25_index
+    from app.context_selection import select_context
+
+    queries = df["Query"].astype(str).tolist()
+    labels = [parse_sources(value) for value in df.get(LABEL_COLUMN, pd.Series([None] * len(df)))]
+    sources = chunk_sources()
+    if any(labels) and not sources:
+        raise SystemExit(f"[Eval] No ingest manifest at {config.INGEST_MANIFEST_PATH}; chunks cannot be mapped to pages.")
+
+    vectors = embed_queries(queries, cache_path)
+    get_index()
+    get_bm25_index()
+    candidates_k = max(max(ks), config.CONTEXT_CANDIDATES)
+
+    def evaluate_row(i: int) -> dict:
+        start = time.perf_counter()
+        candidates = hybrid_search(queries[i], vectors[i].tolist(), top_k=candidates_k, include_values=True)
+        retrieve_ms = (time.perf_counter() - start) * 1000
+        selected = select_context(
+            vectors[i], candidates[:config.CONTEXT_CANDIDATES],
+            max_chunks=config.RETRIEVAL_TOP_K,
+            token_budget=config.CONTEXT_TOKEN_BUDGET,
+            lambda_mult=config.MMR_LAMBDA,
+        )
+        row = {
+            "query": queries[i],
+            "retrieve_ms": round(retrieve_ms, 2),
+            "total_ms": round((time.perf_counter() - start) * 1000, 2),
+            "retrieved": [match["id"] for match in candidates],
+            "context": [match["id"] for match in selected],
+        }
+        if labels[i]:
+            ranked = [sources.get(match["id"], set()) for match in candidates]
+            row.update(score_ranking(ranked, labels[i], ks))
+            context_sources = set().union(*(sources.get(match["id"], set()) for match in selected))
+            row["context_recall"] = len(context_sources & labels[i]) / len(labels[i])
+        return row
+
+    # Bounded parallelism: searches run concurrently on a fixed pool
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        rows = list(executor.map(evaluate_row, range(len(queries))))
+
+    labelled = [row for row in rows if "rr" in row]
+    latencies = np.array([row["total_ms"] for row in rows])
+    summary = {
+        "queries": len(rows),
+        "labelled": len(labelled),
+        "latency_ms": {
+            "mean": round(float(latencies.mean()), 2),
+            "p50": round(float(np.percentile(latencies, 50)), 2),
+            "p95": round(float(np.percentile(latencies, 95)), 2),
+        } if len(rows) else {},
+    }
+    if labelled:
+        for k in ks:
+            summary[f"recall@{k}"] = round(float(np.mean([row[f"recall@{k}"] for row in labelled])), 4)
+        summary["mrr"] = round(float(np.mean([row["rr"] for row in labelled])), 4)
+        summary["context_recall"] = round(float(np.mean([row["context_recall"] for row in labelled])), 4)
+    return {"summary": summary, "rows": rows}
+
+
+def print_retrieval_report(result: dict, ks: List[int]) -> None:
+    summary = result["summary"]
+    print(f"[Eval] {summary['queries']} queries ({summary['labelled']} labelled)")
+    if summary["latency_ms"]:
+        latency = summary["latency_ms"]
+        print(f"[Eval] Retrieval latency ms: mean {latency['mean']}  p50 {latency['p50']}  p95 {latency['p95']}")
+    if summary["labelled"]:
+        recalls = "  ".join(f"recall@{k} {summary[f'recall@{k}']:.3f}" for k in ks)
+        print(f"[Eval] {recalls}  MRR {summary['mrr']:.3f}  context recall {summary['context_recall']:.3f}")
+    else:
+        print(f"[Eval] No `{LABEL_COLUMN}` labels in the dataset; only latency was measured.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["answers", "retrieval"], default="answers")
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument("--threads", type=int, default=int(os.getenv("EVAL_THREADS", "4")),
+                        help="rows evaluated in parallel (default EVAL_THREADS or 4)")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10], help="cut-offs for recall@k")
+    parser.add_argument("--backend", choices=["local", "pinecone"], default="local",
+                        help="vector index searched in retrieval mode")
+    parser.add_argument("--query-cache", default=QUERY_EMBED_CACHE_PATH,
+                        help="on-disk query embedding cache for retrieval mode ('' disables)")
+    parser.add_argument("--output", default=None, help="write retrieval results (JSON) here")
+    parser.add_argument("--latency-only", action="store_true",
+                        help="run retrieval mode on a dataset without relevance labels")
+    args = parser.parse_args()
+
+    # Load environment
+    load_dotenv()
+    df = pd.read_csv(args.dataset)
+
+    if args.mode == "answers":
+        run_answer_evaluation(df, args.threads)
+        return
+
+    labelled = sum(bool(parse_sources(value)) for value in df.get(LABEL_COLUMN, []))
+    if not labelled and not args.latency_only:
+        raise SystemExit(
+            f"[Eval] {args.dataset} has no `{LABEL_COLUMN}` labels, so recall@k and MRR cannot be computed. "
+            f"Add page URLs to that column, or pass --latency-only to measure latency only."
+        )
+
+    from app.config import config
+    os.environ["VECTOR_BACKEND"] = args.backend
+    # No LLM calls; the Gemini key is checked only if a query embedding is missing from the cache
+    config.configure(require_llm=False, require_embeddings=False)
+    ks = sorted(set(args.k))
+    result = run_retrieval_evaluation(df, ks, args.threads, args.query_cache or None)
+    print_retrieval_report(result, ks)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"[Eval] Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
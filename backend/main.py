@@ -1,24 +1,53 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app import api
+from app.chatbot import init_clients, warm_up, aclose_clients, readiness
+from app.config import config
+from app.metrics import HTTP_REQUEST_SECONDS
+from app.tracing import TRACE_HEADER, TraceIdFilter, new_trace_id, trace_id_var
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 import os
+import time
 import logging
 
-# Configure logging
+# Configure logging (every record carries the trace id of the request being handled)
 logging.basicConfig(
     level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+    format="%(asctime)s [%(levelname)s] [%(trace_id)s] %(name)s: %(message)s"
 )
+for handler in logging.getLogger().handlers:
+    handler.addFilter(TraceIdFilter())
 logger = logging.getLogger(__name__)
 
 # Environment configuration
 ENV = os.getenv("ENV", "development")
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Create pooled clients once per worker and close them on shutdown. The
+    warm-up runs in the background so the worker accepts connections (and
+    /ready answers 503) while it is in progress.
+    """
+    await init_clients()
+    warm_up_task = asyncio.create_task(warm_up(enabled=config.WARMUP_ON_STARTUP))
+    yield
+    warm_up_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await warm_up_task
+    await aclose_clients()
+
+
 app = FastAPI(
     title="Changi Airport Chatbot",
     description="Production-grade RAG Chatbot using Gemini + Pinecone",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS setup — secure in prod, flexible in dev
@@ -35,6 +64,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """
+    Assign a trace id per request (or reuse the caller's X-Request-ID),
+    echo it in the response and record request latency by route.
+    """
+    trace_id = new_trace_id(request.headers.get(TRACE_HEADER))
+    token = trace_id_var.set(trace_id)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers[TRACE_HEADER] = trace_id
+        return response
+    finally:
+        elapsed = time.perf_counter() - start
+        # Routes have no path parameters, so a matched path is a bounded label
+        route = request.url.path if request.scope.get("route") is not None else "unmatched"
+        HTTP_REQUEST_SECONDS.labels(request.method, route, str(status)).observe(elapsed)
+        logger.info("%s %s -> %s in %.1f ms", request.method, request.url.path, status, elapsed * 1000)
+        trace_id_var.reset(token)
+
 # Register routes
 app.include_router(api.router, prefix="/api")
 
@@ -46,3 +100,23 @@ async def health_check():
     """
     logger.info("Health check request received.")
     return {"status": "ok", "environment": ENV}
+
+
+@app.get("/ready", tags=["Health Check"])
+async def ready_check():
+    """
+    Readiness probe: 200 once clients are created and the background warm-up
+    has finished (or was skipped), 503 before.
+    Unlike /health (liveness), use it to gate traffic to a new worker.
+    """
+    status = readiness()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Prometheus metrics of this worker: stage latencies, answer outcomes,
+    HTTP latency, cache hit ratios and batching / coalescing counters.
+    """
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
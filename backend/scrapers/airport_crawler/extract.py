@@ -0,0 +1,50 @@
+from typing import List, Tuple
+
+# Text of these elements is not page content
+SKIP_TAGS = {"script", "style", "noscript", "svg", "img", "header", "footer", "iframe", "template"}
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+# Elements that open a new section (a blank line in the extracted text)
+SECTION_TAGS = HEADING_TAGS | {"section", "article", "main", "aside", "nav", "table"}
+
+# Content type of extracted pages, understood by app.utils.cleaner
+CONTENT_TYPE_TEXT = "text/plain"
+
+
+def extract_text(response) -> Tuple[str, str, List[str]]:
+    """
+    Extract (title, content, headings) from the lxml tree Scrapy already
+    built for the response's selectors, so the page is parsed once.
+    Each text node is a line of `content`; sections (headings, <section>,
+    <article>, ...) are separated by a blank line.
+    """
+    root = response.selector.root
+    title = " ".join(response.xpath("//title/text()").get(default="").split())
+
+    sections: List[List[str]] = [[]]
+    headings: List[str] = []
+
+    def add_text(text):
+        if text:
+            lines = [line.strip() for line in text.splitlines()]
+            sections[-1].extend(line for line in lines if line)
+
+    def walk(element):
+        tag = element.tag if isinstance(element.tag, str) else None  # comments / processing instructions
+        if tag in SKIP_TAGS:
+            return
+        if tag in SECTION_TAGS and sections[-1]:
+            sections.append([])
+        if tag in HEADING_TAGS:
+            heading = " ".join(element.text_content().split())
+            if heading:
+                headings.append(heading)
+        if tag is not None:
+            add_text(element.text)
+            for child in element:
+                walk(child)
+                add_text(child.tail)
+
+    if root is not None and hasattr(root, "tag"):
+        walk(root)
+    content = "\n\n".join("\n".join(lines) for lines in sections if lines)
+    return title, content, headings
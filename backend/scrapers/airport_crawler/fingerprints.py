@@ -0,0 +1,68 @@
+import hashlib
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+
+def content_hash(content: str) -> str:
+    """
+    Fingerprint of a page's extracted text (same function as the ingest manifest's page hash).
+    """
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class FingerprintStore:
+    """
+    Per-URL state of the last crawl, persisted as JSON: the validators the
+    server sent (ETag, Last-Modified), a hash of the extracted content and
+    the page's outlinks (followed again when the server answers 304).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, url: str) -> Optional[dict]:
+        return self.entries.get(url)
+
+    def update(self, url: str, etag: Optional[str], last_modified: Optional[str],
+               hash_: str, links: List[str]) -> None:
+        self.entries[url] = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "hash": hash_,
+            "links": links,
+            "crawled_at": time.time(),
+        }
+
+    def remove(self, url: str) -> None:
+        self.entries.pop(url, None)
+
+    @property
+    def pending_path(self) -> str:
+        return self.path + ".pending"
+
+    def save_pending(self) -> None:
+        """
+        Write the state of this crawl next to the store. Ingest commits it
+        (app.embed_store.commit_fingerprints) once the pages are indexed, so
+        a crawl whose pages were never indexed is revalidated against the
+        last indexed state and its changes are sent again.
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.pending_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.pending_path)
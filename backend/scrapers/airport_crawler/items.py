@@ -8,4 +8,9 @@ import scrapy
 
 class PageContentItem(scrapy.Item):
     url = scrapy.Field()
+    title = scrapy.Field()
+    headings = scrapy.Field()
+    # Extracted text, sections separated by a blank line
     content = scrapy.Field()
+    # "text/plain" for extracted text; pages without it are cleaned as HTML
+    content_type = scrapy.Field()
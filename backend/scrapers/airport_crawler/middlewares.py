@@ -98,3 +98,28 @@ class AirportCrawlerDownloaderMiddleware:
 
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
+
+
+class ConditionalRequestMiddleware:
+    """
+    Revalidates pages crawled before: sends If-None-Match / If-Modified-Since
+    with the validators kept in the spider's fingerprint store, so unchanged
+    pages come back as an empty 304. Spiders without a `fingerprints` store or
+    with `revalidate = False`, and requests with meta["revalidate"] = False,
+    are left alone.
+    """
+
+    def process_request(self, request, spider):
+        store = getattr(spider, "fingerprints", None)
+        if store is None or not getattr(spider, "revalidate", True) or not request.meta.get("revalidate", True):
+            return None
+        # Redirected requests copy the original headers; drop validators of another URL
+        request.headers.pop(b"If-None-Match", None)
+        request.headers.pop(b"If-Modified-Since", None)
+        entry = store.get(request.url)
+        if entry:
+            if entry.get("etag"):
+                request.headers[b"If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                request.headers[b"If-Modified-Since"] = entry["last_modified"]
+        return None
@@ -3,11 +3,117 @@
 # Don't forget to add your pipeline to the ITEM_PIPELINES setting
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from twisted.internet import defer, reactor, threads
+
+_DONE = object()
 
 
 class AirportCrawlerPipeline:
+    """
+    Crawl-to-index streaming (STREAM_INDEX = True, see app.crawl_index):
+    scraped pages are handed to app.embed_store.ingest_pages running in a
+    background thread, so cleaning, chunking, embedding and upserts overlap
+    the crawl. The hand-over queue is bounded (STREAM_INDEX_QUEUE pages):
+    when indexing falls behind, process_item waits for room, items pile up
+    in Scrapy's scraper slot and the engine stops scheduling downloads.
+    Vanished pages are removed from the index once the crawl has finished.
+    """
+
+    def __init__(self, queue_size: int):
+        self.pages: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        # A single thread blocks on the full queue; reactor threads stay free for DNS
+        self.feeder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stream-index-feed")
+        self.backlog = 0  # pages waiting in the feeder, keeps them in crawl order
+        self.indexer = None
+        self.stream_ended = False
+        self.error = None
+        self.spider = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("STREAM_INDEX"):
+            raise NotConfigured("STREAM_INDEX is disabled")
+        pipeline = cls(crawler.settings.getint("STREAM_INDEX_QUEUE", 64))
+        # Connected after the spider's own handler, so its tombstones are known by then
+        crawler.signals.connect(pipeline.spider_closed, signal=signals.spider_closed)
+        return pipeline
+
+    def open_spider(self, spider):
+        # Imported here: the backend package is only needed (and importable) in streaming mode
+        from app.embed_store import ingest_pages
+
+        self.spider = spider
+        self.indexer = threading.Thread(
+            target=self._index, args=(ingest_pages,), name="stream-index", daemon=True
+        )
+        self.indexer.start()
+
     def process_item(self, item, spider):
-        return item
+        page = ItemAdapter(item).asdict()
+        if self.error is not None:
+            return item
+        if not self.backlog:
+            try:
+                self.pages.put_nowait(page)
+                return item
+            except queue.Full:
+                pass
+
+        # Backpressure: the item is done (and the scraper slot freed) once it is queued
+        d = defer.Deferred()
+        d.addBoth(self._queued)
+        self.backlog += 1
+        future = self.feeder.submit(self.pages.put, page)
+        future.add_done_callback(lambda _: reactor.callFromThread(d.callback, item))
+        return d
+
+    def _queued(self, result):
+        self.backlog -= 1
+        return result
+
+    def spider_closed(self, spider, reason):
+        # Wait for the indexer off the reactor thread; Scrapy waits for the returned Deferred
+        return threads.deferToThread(self._finish)
+
+    def _finish(self):
+        self.feeder.shutdown(wait=True)
+        self.pages.put(_DONE)
+        self.indexer.join()
+        if self.error is not None:
+            self.spider.logger.error("Streaming index failed: %r", self.error)
+
+    def _index(self, ingest_pages):
+        try:
+            ingest_pages(
+                self._iter_pages(),
+                tombstones=self._tombstones,
+                fingerprints_path=os.path.abspath(self.spider.fingerprints.path),
+            )
+        except Exception as e:
+            self.error = e
+            # Keep draining so the crawl is never blocked on a dead indexer
+            while not self.stream_ended and self.pages.get() is not _DONE:
+                pass
+
+    def _iter_pages(self):
+        for page in iter(self.pages.get, _DONE):
+            yield page
+        self.stream_ended = True
+
+    def _tombstones(self):
+        """
+        URLs to remove from the index: those the finished incremental crawl no
+        longer reached, or None after a full crawl (every live page was seen).
+        """
+        if getattr(self.spider, "full", False) and getattr(self.spider, "close_reason", None) == "finished":
+            return None
+        return list(getattr(self.spider, "tombstones", []))
@@ -46,9 +46,14 @@ DOWNLOAD_DELAY = 1
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-#DOWNLOADER_MIDDLEWARES = {
-#    "airport_crawler.middlewares.AirportCrawlerDownloaderMiddleware": 543,
-#}
+DOWNLOADER_MIDDLEWARES = {
+    "airport_crawler.middlewares.ConditionalRequestMiddleware": 550,
+}
+
+# Incremental crawling: validators and content hashes of the last crawl, and
+# the list of vanished URLs written next to the feed after each crawl
+FINGERPRINTS_PATH = "data/fingerprints.json"
+TOMBSTONES_PATH = "data/tombstones.json"
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
@@ -58,9 +63,14 @@ DOWNLOAD_DELAY = 1
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
-#ITEM_PIPELINES = {
-#    "airport_crawler.pipelines.AirportCrawlerPipeline": 300,
-#}
+ITEM_PIPELINES = {
+    "airport_crawler.pipelines.AirportCrawlerPipeline": 300,
+}
+
+# Crawl-to-index streaming (python -m app.crawl_index from backend/): index pages
+# as they are scraped; at most STREAM_INDEX_QUEUE pages wait for the indexer
+STREAM_INDEX = False
+STREAM_INDEX_QUEUE = 64
 
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
@@ -1,9 +1,20 @@
+import json
+import os
 import scrapy
 from urllib.parse import urlparse
 from airport_crawler.items import PageContentItem
-from bs4 import BeautifulSoup
+from airport_crawler.fingerprints import FingerprintStore, content_hash
+from airport_crawler.extract import CONTENT_TYPE_TEXT, extract_text
+from scrapy.spidermiddlewares.httperror import HttpError
 
 class ChangiSpider(scrapy.Spider):
+    """
+    Incremental crawler: pages seen before are revalidated with conditional
+    requests (see ConditionalRequestMiddleware) and only new or changed pages
+    are written to the feed. URLs of the previous crawl that were not reached
+    again, or that answered 404 / 410, are written to TOMBSTONES_PATH. Pass `-a full=1` to re-download and
+    emit every page.
+    """
     name = "changi_spider"
     allowed_domains = ["changiairport.com", "jewelchangiairport.com"]
 
@@ -12,6 +23,9 @@ class ChangiSpider(scrapy.Spider):
         "https://www.jewelchangiairport.com/"
     ]
 
+    # 304 Not Modified reaches parse() instead of being dropped as an HTTP error
+    handle_httpstatus_list = [304]
+
     custom_settings = {
         "DEPTH_LIMIT": 3,  # crawl deep but controlled
         "DOWNLOAD_DELAY": 0.5,
@@ -25,23 +39,116 @@ class ChangiSpider(scrapy.Spider):
         },
     }
 
+    def __init__(self, full=None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.full = full not in (None, "", "0", "false")
+        self.revalidate = not self.full
+        self.seen = set()
+        self.failed = set()
+        self.gone = set()
+        self.counts = {"new": 0, "changed": 0, "unchanged": 0, "not_modified": 0}
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        spider.fingerprints = FingerprintStore(crawler.settings.get("FINGERPRINTS_PATH", "data/fingerprints.json"))
+        spider.tombstones_path = crawler.settings.get("TOMBSTONES_PATH", "data/tombstones.json")
+        return spider
+
+    def start_requests(self):
+        for url in self.start_urls:
+            yield scrapy.Request(url, callback=self.parse, errback=self.on_error)
+
     def parse(self, response):
-        # Clean up unwanted tags using BeautifulSoup
-        soup = BeautifulSoup(response.text, "html.parser")
-        for tag in soup(["script", "style", "noscript", "svg", "img", "header", "footer"]):
-            tag.decompose()
+        self.seen.add(response.url)
+        entry = self.fingerprints.get(response.url)
 
-        text = soup.get_text(separator="\n", strip=True)
-        lines = [line.strip() for line in text.splitlines() if line.strip()]
-        content = "\n".join(lines)
+        if response.status == 304:
+            # Unchanged since the last crawl: nothing to emit, follow the links recorded then
+            self.counts["not_modified"] += 1
+            for url in (entry or {}).get("links", []):
+                yield self._follow(response, url)
+            return
 
-        yield PageContentItem(url=response.url, content=content)
+        # Text, title and headings come from the lxml tree also used for links below
+        title, content, headings = extract_text(response)
 
-        # follow internal links
+        links = []
         for href in response.css("a::attr(href)").getall():
             full_url = response.urljoin(href)
-            if self._is_valid(full_url):
-                yield response.follow(full_url, callback=self.parse)
+            if self._is_valid(full_url) and full_url not in links:
+                links.append(full_url)
+
+        hash_ = content_hash(content)
+        if self.full or entry is None or entry.get("hash") != hash_:
+            self.counts["changed" if entry is not None else "new"] += 1
+            yield PageContentItem(
+                url=response.url,
+                title=title,
+                headings=headings,
+                content=content,
+                content_type=CONTENT_TYPE_TEXT,
+            )
+        else:
+            # No validators or a server that ignores them: the content hash decides
+            self.counts["unchanged"] += 1
+
+        self.fingerprints.update(
+            response.url,
+            etag=self._header(response, b"ETag"),
+            last_modified=self._header(response, b"Last-Modified"),
+            hash_=hash_,
+            links=links,
+        )
+
+        # follow internal links
+        for full_url in links:
+            yield self._follow(response, full_url)
+
+    def on_error(self, failure):
+        if failure.check(HttpError) and failure.value.response.status in (404, 410):
+            # Deleted page, possibly still linked from elsewhere
+            self.gone.add(failure.request.url)
+        else:
+            # A page that could not be fetched this time is not reported as vanished
+            self.failed.add(failure.request.url)
+
+    def closed(self, reason):
+        """
+        Write the fingerprints of this crawl (committed by ingest) and the
+        tombstone list. An interrupted crawl did not reach every page, so it
+        only reports the pages that answered 404 / 410.
+        """
+        vanished = set(self.gone)
+        self.close_reason = reason
+        if reason == "finished":
+            vanished.update(url for url in self.fingerprints.entries
+                            if url not in self.seen and url not in self.failed)
+        tombstones = sorted(vanished)
+        for url in tombstones:
+            self.fingerprints.remove(url)
+        self.tombstones = tombstones
+        self.fingerprints.save_pending()
+
+        directory = os.path.dirname(self.tombstones_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.tombstones_path, "w", encoding="utf-8") as f:
+            json.dump({"full": self.full, "removed": tombstones}, f)
+
+        self.logger.info(
+            "Crawl %s: %d new, %d changed, %d unchanged, %d not modified (304), %d vanished, %d failed",
+            reason, self.counts["new"], self.counts["changed"], self.counts["unchanged"],
+            self.counts["not_modified"], len(tombstones), len(self.failed),
+        )
+
+    def _follow(self, response, url):
+        return response.follow(url, callback=self.parse, errback=self.on_error)
+
+    @staticmethod
+    def _header(response, name):
+        value = response.headers.get(name)
+        return value.decode("latin-1") if value else None
 
     def _is_valid(self, url):
         parsed = urlparse(url)
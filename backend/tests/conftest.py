@@ -0,0 +1,108 @@
+import asyncio
+import hashlib
+import re
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+_WORD_RE = re.compile(r"\w+")
+
+
+class FakeEmbeddings:
+    """
+    Deterministic bag-of-words embeddings: texts sharing words are close.
+    Mirrors the parts of GoogleGenerativeAIEmbeddings the app calls.
+    """
+
+    def __init__(self, dimension: int = 768):
+        self.dimension = dimension
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimension)
+        for word in _WORD_RE.findall(text.lower()):
+            digest = hashlib.md5(word.encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dimension] += 1.0
+        return vector.tolist()
+
+    def embed_documents(self, texts, task_type=None):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+    async def aembed_documents(self, texts, task_type=None):
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text):
+        return self.embed_query(text)
+
+
+class FakeLLM:
+    """
+    Answers with the first context passage of the prompt.
+    """
+
+    def _answer(self, prompt):
+        match = re.search(r"\[1\] (.*)", prompt)
+        return SimpleNamespace(content=f"From the guide: {match.group(1) if match else 'nothing'}")
+
+    def invoke(self, prompt, **kwargs):
+        return self._answer(prompt)
+
+    async def ainvoke(self, prompt, **kwargs):
+        await asyncio.sleep(0)
+        return self._answer(prompt)
+
+    async def astream(self, prompt, **kwargs):
+        for token in self._answer(prompt).content.split(" "):
+            await asyncio.sleep(0)
+            yield SimpleNamespace(content=token + " ")
+
+
+def _reset_shared_clients():
+    """
+    Drop every lazily built client / store, so the next use reads the test configuration.
+    """
+    for name in ("app.embeddings", "app.vector_store", "app.chatbot"):
+        module = sys.modules.get(name)
+        for value in list(vars(module).values()) if module else []:
+            if callable(getattr(value, "reset", None)) and callable(getattr(value, "initialized", None)):
+                value.reset()
+
+
+@pytest.fixture
+def offline_app(tmp_path, monkeypatch):
+    """
+    The app configured for the local vector index in a temporary directory,
+    with fake embedding and LLM clients: ingest and answers run offline.
+    """
+    from app.config import config
+    from app.utils.lazy import once
+    import app.embeddings as embeddings
+    import app.vector_store as vector_store
+    import app.chatbot as chatbot
+
+    env = {
+        "VECTOR_BACKEND": "local",
+        "GEMINI_API_KEY": "test",
+        "GROQ_API_KEY": "test",
+        "LOCAL_INDEX_DIR": str(tmp_path / "local_index"),
+        "INDEX_VERSION_PATH": str(tmp_path / "index_version"),
+        "INGEST_MANIFEST_PATH": str(tmp_path / "ingest_manifest.json"),
+        "KNOWN_IDS_PATH": str(tmp_path / "known_ids.npz"),
+        "BM25_INDEX_PATH": str(tmp_path / "bm25_index.json"),
+        "EMBED_CACHE_PATH": "",
+        "INGEST_WORKERS": "1",
+        "QUERY_BATCH_SIZE": "1",
+    }
+    for key, value in env.items():
+        monkeypatch.setenv(key, value)
+    monkeypatch.setattr(config, "_config", None)
+    monkeypatch.setattr(vector_store, "_local_index", None)
+    monkeypatch.setattr(embeddings, "_build_model", lambda task_type: FakeEmbeddings())
+    monkeypatch.setattr(chatbot, "get_llm", once(FakeLLM))
+    _reset_shared_clients()
+    yield tmp_path
+    _reset_shared_clients()
@@ -0,0 +1,17 @@
+import random
+
+from benchmarks.bench_cleaner import EQUIVALENCE_CASES, current_normalize, legacy_normalize
+
+
+def test_normalizer_matches_previous_implementation_on_edge_cases():
+    for text in EQUIVALENCE_CASES:
+        assert current_normalize(text) == legacy_normalize(text), text
+
+
+def test_normalizer_matches_previous_implementation_on_random_text():
+    rng = random.Random(0)
+    tokens = ["url", "URL", "Url:", "http:", "HTTPS://x.y", "https://a.b/c", '"', ":", ",", "..", "--",
+              "!!", " ", "\n", "Terminal", "é", "😀", "(", ")", "/", "#", "&amp;"]
+    for _ in range(2000):
+        text = "".join(rng.choice(tokens) + rng.choice(["", " "]) for _ in range(rng.randint(1, 12)))
+        assert current_normalize(text) == legacy_normalize(text), repr(text)
@@ -0,0 +1,33 @@
+from app.utils.dedup import NearDuplicateDetector
+
+SHARED = " ".join(f"word{i}" for i in range(150))
+LONG_SHARED = " ".join(f"word{i}" for i in range(400))
+
+
+def test_boilerplate_variant_is_a_near_duplicate():
+    detector = NearDuplicateDetector(threshold=0.9)
+    assert detector.find(f"Changi Airport guide {SHARED} see more", "a") is None
+    assert detector.find(f"Changi Airport guide {SHARED} read more", "b") == "a"
+    assert detector.removed == 1
+
+
+def test_capitalised_dated_boilerplate_variants_are_near_duplicates():
+    detector = NearDuplicateDetector(threshold=0.9)
+    assert detector.find(f"Last updated 12 May 2025 at 9am. {LONG_SHARED} Explore Jewel today", "a") is None
+    assert detector.find(f"Last updated 3rd June 2025 at 10pm. {LONG_SHARED} Discover Jewel today", "b") == "a"
+    assert detector.find(f"Updated on 1 Jan 2026. {LONG_SHARED} Shop at Kaboodle Enterprise today", "c") == "a"
+    assert detector.removed == 2
+
+
+def test_chunks_differing_in_an_identifier_are_kept():
+    detector = NearDuplicateDetector(threshold=0.9)
+    assert detector.find(f"Terminal 1 {SHARED}", "t1") is None
+    assert detector.find(f"Terminal 2 {SHARED}", "t2") is None
+    assert detector.find(f"Terminal 2 {SHARED} Gate B4", "t2-gate") is None
+    assert detector.find(f"Terminal 2 {SHARED} Gate B4 then gate 7", "t2-gate-7") is None
+    assert detector.removed == 0
+
+
+def test_key_tokens():
+    tokens = NearDuplicateDetector.key_tokens("Head to T4, Gate B12 or gate 3 by 10am on 12 May 2025 (Terminal 2)")
+    assert tokens == {"t4", "b12", "gate 3", "terminal 2"}
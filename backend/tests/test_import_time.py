@@ -0,0 +1,14 @@
+import os
+
+import pytest
+
+from benchmarks.import_time import DEFAULT_BUDGETS, measure
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize("module", ["app.config", "app.embeddings", "app.vector_store", "app.chatbot"])
+def test_module_imports_without_credentials_within_budget(module):
+    # Best of 3 fresh interpreters, no credentials in their environment
+    best_ms = min(measure(module, cwd=BACKEND_DIR) for _ in range(3)) / 1000
+    assert best_ms <= DEFAULT_BUDGETS[module], f"{module} imports in {best_ms:.1f} ms"
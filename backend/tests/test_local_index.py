@@ -0,0 +1,73 @@
+import json
+import os
+
+import numpy as np
+
+from app.local_index import LocalVectorIndex
+
+DIM = 8
+
+
+def _vector(seed):
+    return np.random.default_rng(seed).random(DIM).tolist()
+
+
+def test_upsert_query_and_update_in_place(tmp_path):
+    index = LocalVectorIndex(str(tmp_path), DIM)
+    index.upsert([(f"id{i}", _vector(i), {"text": f"chunk {i}"}) for i in range(10)])
+
+    match = index.query(_vector(3), top_k=1)["matches"][0]
+    assert match["id"] == "id3"
+    assert match["metadata"] == {"text": "chunk 3"}
+    assert abs(match["score"] - 1.0) < 1e-5
+
+    index.upsert([{"id": "id3", "values": _vector(42), "metadata": {"text": "updated"}}])
+    assert index.describe_index_stats()["total_vector_count"] == 10
+    assert index.fetch(["id3"]).vectors["id3"].metadata == {"text": "updated"}
+    assert index.query(_vector(42), top_k=1)["matches"][0]["id"] == "id3"
+
+
+def test_delete_compacts_rows_and_drops_the_upsert_log(tmp_path):
+    index = LocalVectorIndex(str(tmp_path), DIM)
+    index.upsert([(f"id{i}", _vector(i), {"text": str(i)}) for i in range(5)])
+    index.delete(["id1", "id3", "missing"])
+
+    assert sorted(id_ for page in index.list() for id_ in page) == ["id0", "id2", "id4"]
+    assert index.query(_vector(4), top_k=1)["matches"][0]["id"] == "id4"
+    files = os.listdir(tmp_path)
+    assert not [name for name in files if name.endswith(".log")]
+    assert len([name for name in files if name.endswith(".f32")]) == 1
+    with open(tmp_path / "index.json") as f:
+        assert json.load(f)["ids"] == ["id0", "id2", "id4"]
+
+    reopened = LocalVectorIndex(str(tmp_path), DIM)
+    assert reopened.fetch(["id2"]).vectors["id2"].metadata == {"text": "2"}
+
+
+def test_other_instances_replay_upserts_and_deletes(tmp_path):
+    writer = LocalVectorIndex(str(tmp_path), DIM)
+    reader = LocalVectorIndex(str(tmp_path), DIM)
+
+    writer.upsert([("a", _vector(1), {"text": "a"})])
+    assert reader.describe_index_stats()["total_vector_count"] == 1
+    writer.upsert([("b", _vector(2), {"text": "b"}), ("a", _vector(3), {"text": "a2"})])
+    assert reader.fetch(["a", "b"]).vectors["a"].metadata == {"text": "a2"}
+    assert reader.query(_vector(2), top_k=1)["matches"][0]["id"] == "b"
+
+    reader.delete(["a"])
+    assert writer.describe_index_stats()["total_vector_count"] == 1
+    writer.upsert([("c", _vector(4), {})])
+    assert sorted(id_ for page in reader.list() for id_ in page) == ["b", "c"]
+
+
+def test_partial_log_line_is_ignored_and_overwritten(tmp_path):
+    index = LocalVectorIndex(str(tmp_path), DIM)
+    index.upsert([("a", _vector(1), {})])
+    log_name = next(name for name in os.listdir(tmp_path) if name.endswith(".log"))
+    with open(tmp_path / log_name, "ab") as f:
+        f.write(b'["interrupted", {"te')
+
+    assert LocalVectorIndex(str(tmp_path), DIM).describe_index_stats()["total_vector_count"] == 1
+    index.upsert([("b", _vector(2), {})])
+    reopened = LocalVectorIndex(str(tmp_path), DIM)
+    assert sorted(id_ for page in reopened.list() for id_ in page) == ["a", "b"]
@@ -0,0 +1,78 @@
+import asyncio
+import json
+
+import app.chatbot as chatbot
+from app.chatbot import aanswer_with_context, aclose_clients, answer_with_context, astream_answer
+from app.embed_store import run_rag_pipeline
+from app.vector_store import get_index
+
+PAGES = [
+    {
+        "url": "https://www.changiairport.com/pets",
+        "content": "Travelling with pets\n\nPets travelling from Changi must be checked in as cargo "
+                   "with an approved pet relocation agent. Only guide dogs may travel in the cabin.",
+        "content_type": "text/plain",
+    },
+    {
+        "url": "https://www.jewelchangiairport.com/rain-vortex",
+        "content": "Rain Vortex\n\nThe Rain Vortex at Jewel is the world's tallest indoor waterfall, "
+                   "falling 40 metres from the roof oculus into the Forest Valley garden.",
+        "content_type": "text/plain",
+    },
+]
+
+
+def _write_feed(directory, pages):
+    path = directory / "scraped_pages.json"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(pages, f)
+    return str(path)
+
+
+def test_ingest_then_answer_offline(offline_app):
+    run_rag_pipeline(_write_feed(offline_app, PAGES))
+    assert get_index().describe_index_stats()["total_vector_count"] == 2
+
+    result = answer_with_context("How tall is the Rain Vortex waterfall at Jewel?")
+    assert result.outcome == "answered"
+    assert "Rain Vortex" in result.contexts[0]
+    assert "tallest indoor waterfall" in result.answer
+
+    result = asyncio.run(aanswer_with_context("Can my pets travel in the cabin from Changi?"))
+    assert result.outcome == "answered"
+    assert "pet relocation agent" in result.contexts[0]
+
+
+def test_reingest_removes_vanished_pages(offline_app):
+    run_rag_pipeline(_write_feed(offline_app, PAGES))
+    run_rag_pipeline(_write_feed(offline_app, PAGES[:1]))
+
+    assert get_index().describe_index_stats()["total_vector_count"] == 1
+    result = answer_with_context("Rain Vortex waterfall")
+    assert result.outcome in ("answered", "not_found")
+    assert all("Rain Vortex" not in context for context in result.contexts)
+
+
+def test_aclose_clients_without_pooled_http_clients(offline_app):
+    # The fake LLM, like some ChatGroq versions, has no http_client / http_async_client
+    chatbot.get_llm()
+    asyncio.run(aclose_clients())
+    assert not chatbot.get_llm.initialized()
+
+
+def test_async_paths_sanitize_the_query_once(offline_app, monkeypatch):
+    run_rag_pipeline(_write_feed(offline_app, PAGES))
+    calls = []
+    sanitize_query = chatbot.sanitize_query
+    monkeypatch.setattr(chatbot, "sanitize_query", lambda query: calls.append(query) or sanitize_query(query))
+
+    result = asyncio.run(aanswer_with_context("  How tall is the Rain Vortex?  "))
+    assert result.outcome == "answered"
+    assert calls == ["  How tall is the Rain Vortex?  "]
+
+    async def stream():
+        return "".join([token async for token in astream_answer("Can pets travel in the cabin?")])
+
+    calls.clear()
+    assert "pet relocation agent" in asyncio.run(stream())
+    assert calls == ["Can pets travel in the cabin?"]
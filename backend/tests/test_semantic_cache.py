@@ -0,0 +1,41 @@
+import app.semantic_cache as semantic_cache
+from app.semantic_cache import SemanticCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(semantic_cache.time, "monotonic", clock)
+    cache = SemanticCache(dimension=2, maxsize=2, ttl=60)
+
+    cache.store([1.0, 0.0], "first", ["a"])
+    clock.now += 30
+    cache.store([0.0, 1.0], "second", ["b"])
+    assert cache.lookup([1.0, 0.01]).answer == "first"
+
+    clock.now += 31
+    assert cache.lookup([1.0, 0.01]) is None
+    assert cache.lookup([0.01, 1.0]).answer == "second"
+
+    # The expired slot is reused before the least recently used live entry
+    cache.store([0.7, 0.7], "third", ["c"])
+    assert cache.lookup([0.01, 1.0]).answer == "second"
+    assert cache.lookup([0.7, 0.71]).answer == "third"
+
+
+def test_version_change_drops_entries_without_ttl():
+    version = [1]
+    cache = SemanticCache(dimension=2, maxsize=4, version_fn=lambda: version[0])
+    cache.store([1.0, 0.0], "answer", ["a"])
+    assert cache.lookup([1.0, 0.0]).answer == "answer"
+
+    version[0] = 2
+    assert cache.lookup([1.0, 0.0]) is None
+    assert len(cache) == 0
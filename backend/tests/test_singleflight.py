@@ -0,0 +1,47 @@
+import asyncio
+
+from app.utils.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    async def scenario():
+        flight = SingleFlight()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "answer"
+
+        results = await asyncio.gather(*(flight.do("q", work) for _ in range(5)))
+        return results, calls, flight.stats()
+
+    results, calls, stats = asyncio.run(scenario())
+    assert results == ["answer"] * 5
+    assert calls == 1
+    assert stats == {"executions": 1, "shared": 4, "in_flight": 0}
+
+
+def test_caller_after_last_waiter_cancelled_starts_a_fresh_call():
+    async def scenario():
+        flight = SingleFlight()
+        started = asyncio.Event()
+
+        async def work():
+            started.set()
+            await asyncio.sleep(0.05)
+            return "answer"
+
+        first = asyncio.ensure_future(flight.do("q", work))
+        await started.wait()
+        first.cancel()
+        # Let the cancellation reach the waiter, but not the task's done-callback
+        await asyncio.sleep(0)
+        assert first.cancelled()
+        # Arrives while the old task is still unwinding
+        return await flight.do("q", work), flight.stats()
+
+    result, stats = asyncio.run(scenario())
+    assert result == "answer"
+    assert stats["executions"] == 2